@@ -9,15 +9,108 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = "admin"
     DB_NAME: str = "pvz_db"
 
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_TIMEOUT: float = 10.0  # сколько секунд ждать свободное соединение
+    DB_POOL_RECYCLE_SECONDS: float = 1800.0  # максимальный возраст соединения
+    DB_POOL_CHECK_IDLE_SECONDS: float = (
+        30.0  # пинговать соединения, простаивавшие дольше
+    )
+    # Запросы дольше этого пишутся в лог с типами параметров вместо значений,
+    # 0 - не писать
+    DB_SLOW_QUERY_SECONDS: float = 0.5
+    # Сколько ждать, пока миграции применяет другой процесс, прежде чем
+    # прервать запуск
+    MIGRATIONS_LOCK_TIMEOUT_SECONDS: float = 600.0
+
+    # Реплика для чтения (GET /pvz, выгрузка, GetPVZList, StreamPVZList):
+    # строка подключения libpq, пустая - всё читается из основной БД
+    DB_REPLICA_DSN: str = ""
+    # При большем отставании реплики чтение идёт в основную БД
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_SECONDS: float = 1.0  # как часто проверять отставание реплики
+    DB_REPLICA_TIMEOUT: float = 1.0  # сколько секунд ждать соединение с репликой
+
+    # Корзины гистограмм HTTP: запись укладывается в единицы миллисекунд,
+    # поэтому корзины до 10 мс мельче стандартных
+    HTTP_LATENCY_BUCKETS: list[float] = [
+        0.001,
+        0.0025,
+        0.005,
+        0.0075,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    ]
+    HTTP_SIZE_BUCKETS: list[float] = [100, 1000, 10000, 100000, 1000000, 10000000]
+
     TEST_DB_HOST: str = "localhost"
     TEST_DB_PORT: int = 5432
     TEST_DB_USER: str = "postgres"
     TEST_DB_PASSWORD: str = "admin"
     TEST_DB_NAME: str = "pvz_test_db"
 
+    # GET /pvz: собирать JSON ответа в PostgreSQL, а не в Python.
+    # Можно переопределить для отдельного запроса параметром fast_json
+    PVZ_LIST_SQL_JSON: bool = False
+
+    # Кэш ответов GET /pvz: сколько страниц хранить (0 - выключен) и сколько
+    # секунд хранить страницу. Изменения из других процессов видны через ttl
+    PVZ_LIST_CACHE_SIZE: int = 1000
+    PVZ_LIST_CACHE_TTL_SECONDS: float = 5.0
+
+    EXPORT_BATCH_SIZE: int = 2000  # строк за одно чтение серверного курсора выгрузки
+
+    PRODUCTS_BATCH_MAX_SIZE: int = 1000  # товаров в одном POST /products/batch
+
+    # Запуск в несколько воркеров через python -m app.server
+    APP_HOST: str = "0.0.0.0"
+    APP_PORT: int = 8080
+    APP_WORKERS: int = 1
+    METRICS_PORT: int = 9000
+    # Каталог файлов метрик воркеров (multiprocess режим prometheus_client)
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/prometheus_multiproc"
+    # Выставляется супервизором: lifespan воркера пропускает однократные
+    # задачи (миграции, openapi.json, сервер метрик, gRPC)
+    APP_SUPERVISED: bool = False
+
+    LOG_JSON: bool = False  # писать лог в JSON, по записи на строку
+    LOG_ROTATE_WHEN: str = "midnight"  # параметр when TimedRotatingFileHandler
+    LOG_BACKUP_COUNT: int = 14  # сколько старых файлов лога хранить
+    LOG_INFO_SAMPLE_RATE: float = 1.0  # доля info-сообщений, попадающих в лог
+
+    GRPC_PORT: int = 3000
+    GRPC_WORKERS: int = 1  # процессов grpc.aio, слушающих порт через SO_REUSEPORT
+    GRPC_MAX_CONCURRENT_STREAMS: int = 100  # на одно HTTP/2 соединение
+    GRPC_MAX_CONCURRENT_RPCS: int = 1000  # на один процесс, 0 - без ограничения
+    GRPC_KEEPALIVE_TIME_MS: int = 30000
+    GRPC_KEEPALIVE_TIMEOUT_MS: int = 10000
+    GRPC_SHUTDOWN_GRACE_SECONDS: float = 5.0
+    GRPC_RUN_IN_APP: bool = False  # запускать gRPC сервер из lifespan FastAPI
+    # Сервер метрик отдельно запущенного gRPC сервера: метрики его воркеров
+    # суммируются через свой каталог multiprocess режима
+    GRPC_METRICS_PORT: int = 9001
+    GRPC_PROMETHEUS_MULTIPROC_DIR: str = "/tmp/prometheus_multiproc_grpc"
+
+    GRPC_PVZ_PAGE_SIZE: int = 500  # ПВЗ на страницу/сообщение по умолчанию
+    GRPC_PVZ_MAX_PAGE_SIZE: int = 5000
+
     SECRET_KEY: str = "secret-key"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_CACHE_SIZE: int = 10000  # проверенных токенов в памяти процесса, 0 - без кэша
+
+    BCRYPT_ROUNDS: int = 12  # стоимость хэша новых паролей
+    BCRYPT_WORKERS: int = 2  # процессов для bcrypt
+    BCRYPT_MAX_PENDING: int = 32  # хэшей в работе и в очереди, дальше - 503
+    BCRYPT_RETRY_AFTER_SECONDS: int = 1
 
 
 settings = Settings()
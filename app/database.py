@@ -1,224 +1,795 @@
+import base64
+import time
+import uuid
+import psycopg
 import psycopg2
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List
 from app.config import settings
 from app.logger import logger
+from app.metrics import DB_READ_SESSIONS, DB_REPLICA_FALLBACKS, DB_REPLICA_LAG
+from app.migrate import run_migrations
+from app.pool import create_async_pool, async_connection
+from app.query_timing import execute, timed_query
 
-import psycopg2.extras
 
-psycopg2.extras.register_uuid()
+_async_pool = None
 
+_replica_pool = None
+_replica_state = None
 
-def get_db():
-    conn = psycopg2.connect(
+
+def _connect_kwargs() -> dict:
+    return dict(
         host=settings.DB_HOST,
         port=settings.DB_PORT,
         user=settings.DB_USER,
         password=settings.DB_PASSWORD,
         dbname=settings.DB_NAME,
     )
-    try:
+
+
+async def open_async_pool():
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = create_async_pool(
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            recycle_seconds=settings.DB_POOL_RECYCLE_SECONDS,
+            check_idle_seconds=settings.DB_POOL_CHECK_IDLE_SECONDS,
+            **_connect_kwargs(),
+        )
+        await _async_pool.open()
+        logger.info("Асинхронный пул соединений создан")
+    return _async_pool
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+@asynccontextmanager
+async def async_db_session():
+    pool = await open_async_pool()
+    async with async_connection(pool) as conn:
+        yield conn
+
+
+async def get_async_db():
+    async with async_db_session() as conn:
         yield conn
+
+
+def get_async_db_factory():
+    # Для потоковых ответов: зависимости с yield закрываются до того, как
+    # StreamingResponse начнёт отдавать данные, поэтому генератор ответа
+    # сам берёт соединение через эту фабрику и держит его до конца выгрузки
+    return async_db_session
+
+
+# Реплика для чтения. Обработчики, которые только читают (GET /pvz, выгрузка,
+# GetPVZList, StreamPVZList), берут соединение через async_read_session: оно
+# выдаётся из реплики (DB_REPLICA_DSN), если та доступна и отстаёт не больше
+# DB_REPLICA_MAX_LAG_SECONDS, иначе - из основной БД
+
+# Если реплика применила всё полученное WAL и WAL receiver получает поток
+# от основной БД, отставание 0: время последней применённой транзакции растёт
+# и тогда, когда в основную БД просто не пишут. Без streaming (соединение с
+# основной БД потеряно, или статус не виден без роли pg_read_all_stats)
+# реплика тоже "применила всё", но может быть сколь угодно устаревшей, поэтому
+# берётся время с последней применённой транзакции - оценка сверху.
+# Не реплика (pg_is_in_recovery() = false) не отстаёт. NULL - отставание
+# неизвестно (реплика ещё ничего не применила)
+REPLICA_STATUS_SQL = """
+    SELECT
+        pg_is_in_recovery() AS in_recovery,
+        pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS replayed_all,
+        EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'
+        ) AS streaming,
+        extract(epoch FROM now() - pg_last_xact_replay_timestamp()) AS replay_age
+"""
+
+
+def replica_lag_query(status_sql: str = REPLICA_STATUS_SQL) -> str:
+    return f"""
+        WITH replica AS ({status_sql})
+        SELECT CASE
+            WHEN NOT in_recovery THEN 0
+            WHEN replayed_all AND streaming THEN 0
+            ELSE replay_age
+        END
+        FROM replica
+    """
+
+
+REPLICA_LAG_QUERY = replica_lag_query()
+
+
+class ReplicaState:
+    # Результат последней проверки реплики. Проверка выполняется не чаще раза
+    # в check_interval секунд одним запросом, остальные запросы в это время
+    # используют предыдущий результат
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None  # None - реплика недоступна или отставание неизвестно
+        self.checked_at = None
+        self.checking = False
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= self.max_lag
+
+    def due(self) -> bool:
+        if self.checking:
+            return False
+        return (
+            self.checked_at is None
+            or time.monotonic() - self.checked_at >= self.check_interval
+        )
+
+    def record(self, lag: float | None) -> bool:
+        # Возвращает True после первой проверки и когда реплика стала
+        # пригодной или перестала быть ею
+        first = self.checked_at is None
+        was_usable = self.usable
+        self.lag = lag
+        self.checked_at = time.monotonic()
+        if lag is not None:
+            DB_REPLICA_LAG.set(lag)
+        return first or was_usable != self.usable
+
+
+async def open_replica_pool():
+    # None, если реплика не настроена
+    global _replica_pool, _replica_state
+    if not settings.DB_REPLICA_DSN:
+        return None
+    if _replica_pool is None:
+        _replica_pool = create_async_pool(
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            timeout=settings.DB_REPLICA_TIMEOUT,
+            recycle_seconds=settings.DB_POOL_RECYCLE_SECONDS,
+            check_idle_seconds=settings.DB_POOL_CHECK_IDLE_SECONDS,
+            name="replica_async",
+            conninfo=settings.DB_REPLICA_DSN,
+        )
+        _replica_state = ReplicaState(
+            settings.DB_REPLICA_MAX_LAG_SECONDS, settings.DB_REPLICA_CHECK_SECONDS
+        )
+        # Не ждёт соединений: недоступная при старте реплика не мешает запуску
+        await _replica_pool.open()
+        logger.info("Асинхронный пул соединений с репликой создан")
+    return _replica_pool
+
+
+async def close_replica_pool():
+    global _replica_pool, _replica_state
+    if _replica_pool is not None:
+        await _replica_pool.close()
+        _replica_pool = None
+        _replica_state = None
+
+
+async def check_replica(pool, state: ReplicaState):
+    # Пока реплика недоступна, один запрос за check_interval ждёт соединение
+    # с ней до DB_REPLICA_TIMEOUT. В лог пишутся только переключения
+    error = "отставание неизвестно"
+    state.checking = True
+    try:
+        async with async_connection(pool) as conn:
+            cur = conn.cursor()
+            await execute(cur, "replica_lag", REPLICA_LAG_QUERY)
+            (lag,) = await cur.fetchone()
+        lag = float(lag) if lag is not None else None
+    except psycopg.Error as e:
+        lag, error = None, str(e)
     finally:
-        conn.close()
+        state.checking = False
+
+    if state.record(lag):
+        if state.usable:
+            logger.info(f"Чтение переключено на реплику, отставание {lag:.1f} с")
+        elif lag is None:
+            logger.warning(
+                f"Чтение переключено на основную БД: реплика недоступна ({error})"
+            )
+        else:
+            logger.warning(
+                f"Чтение переключено на основную БД: реплика отстаёт на {lag:.1f} с"
+            )
+
+
+@asynccontextmanager
+async def async_read_session():
+    # Только для чтения: в реплику нельзя писать, а запись, сделанная в основной
+    # БД, может появиться в реплике с задержкой до DB_REPLICA_MAX_LAG_SECONDS
+    pool = await open_replica_pool()
+    state = _replica_state
+    if pool is not None:
+        if state.due():
+            await check_replica(pool, state)
+        if state.usable:
+            conn = None
+            try:
+                async with async_connection(pool) as conn:
+                    DB_READ_SESSIONS.labels(target="replica").inc()
+                    yield conn
+                return
+            except psycopg.Error as e:
+                if conn is not None:
+                    # Ошибка запроса: повторять его в основной БД уже поздно
+                    if conn.broken:
+                        state.record(None)
+                    raise
+                # Соединение не получено - читаем из основной БД
+                if state.record(None):
+                    logger.warning(
+                        f"Чтение переключено на основную БД: реплика недоступна ({e})"
+                    )
+        DB_REPLICA_FALLBACKS.labels(
+            reason="unavailable" if state.lag is None else "lag"
+        ).inc()
+
+    async with async_db_session() as conn:
+        DB_READ_SESSIONS.labels(target="primary").inc()
+        yield conn
+
+
+def get_async_read_db_factory():
+    # Как get_async_db_factory, но для обработчиков, которые только читают
+    return async_read_session
 
 
 def init_db():
+    # Без миграций запросы приложения не работают (индекс активной приёмки,
+    # products.seq), поэтому ошибка прерывает запуск
     conn = None
     try:
-        conn = psycopg2.connect(
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            dbname=settings.DB_NAME,
-        )
-        cur = conn.cursor()
-
-        with open("app/init_db.sql", "r", encoding="CP1251") as f:
-            sql_script = f.read()
-
-        cur.execute(sql_script)
-        conn.commit()
-        logger.info("БД инициализирована")
+        conn = psycopg2.connect(**_connect_kwargs())
+        applied = run_migrations(conn)
+        logger.info(f"БД инициализирована, применено миграций: {len(applied)}")
 
     except Exception as e:
-        logger.error(f"Ошибка при создании таблиц: {e}")
+        logger.error(f"Ошибка при применении миграций: {e}")
+        raise
     finally:
         if conn:
             conn.close()
 
 
-def has_active_reception(connection, pvz_id) -> bool:
-    conn = None
-    try:
-        conn = connection
-        cur = conn.cursor()
+# Запросы выполняются через psycopg 3, psycopg2 остаётся только для миграций
+
+RECEPTIONS_BY_PVZ_QUERY = """
+    SELECT id, date_time, pvz_id, status
+    FROM receptions
+    WHERE pvz_id = ANY(%s)
+"""
 
-        cur.execute(
-            "(SELECT 1 FROM pvz WHERE id = %s LIMIT 1)",
-            (pvz_id,),
+PRODUCTS_BY_RECEPTION_QUERY = """
+    SELECT id, date_time, type, reception_id
+    FROM products
+    WHERE reception_id = ANY(%s)
+    ORDER BY reception_id, date_time
+"""
+
+
+def _reception_date_conditions(
+    start_date: datetime = None, end_date: datetime = None, alias: str = "r"
+) -> tuple[list[str], list]:
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append(f"{alias}.date_time >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append(f"{alias}.date_time <= %s")
+        params.append(end_date)
+    return conditions, params
+
+
+def build_pvz_page_query(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    page: int = 1,
+    limit: int = 10,
+    after: tuple | None = None,
+) -> tuple[str, list]:
+    # Первая фаза: страница ПВЗ. Пагинация идёт по ПВЗ, а не по строкам join,
+    # поэтому limit=10 - это всегда 10 ПВЗ, сколько бы товаров у них ни было.
+    # Если передан after (registration_date, id), используется keyset вместо OFFSET
+    query = "SELECT id, registration_date, city FROM pvz"
+    where = []
+    params = []
+
+    conditions, date_params = _reception_date_conditions(start_date, end_date)
+    if conditions:
+        where.append(
+            f"""EXISTS (
+            SELECT 1 FROM receptions r
+            WHERE r.pvz_id = pvz.id AND {" AND ".join(conditions)}
+        )"""
         )
+        params.extend(date_params)
+
+    if after:
+        where.append("(registration_date, id) < (%s, %s)")
+        params.extend(after)
+
+    if where:
+        query += " WHERE " + " AND ".join(where)
+
+    query += " ORDER BY registration_date DESC, id DESC"
+    if after:
+        query += " LIMIT %s"
+        params.append(limit)
+    else:
+        query += " LIMIT %s OFFSET %s"
+        params.extend([limit, (page - 1) * limit])
+    return query, params
+
+
+def encode_pvz_cursor(registration_date: datetime, pvz_id) -> str:
+    raw = f"{registration_date.isoformat()}|{pvz_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_pvz_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    # ValueError, если курсор повреждён
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        registration_date, pvz_id = raw.split("|")
+        return datetime.fromisoformat(registration_date), uuid.UUID(pvz_id)
+    except Exception:
+        raise ValueError("Некорректный курсор")
+
+
+def build_receptions_query(
+    pvz_ids: list, start_date: datetime = None, end_date: datetime = None
+) -> tuple[str, list]:
+    # Вторая фаза: приёмки всех ПВЗ страницы одним запросом
+    query = RECEPTIONS_BY_PVZ_QUERY
+    conditions, params = _reception_date_conditions(
+        start_date, end_date, alias="receptions"
+    )
+    if conditions:
+        query += " AND " + " AND ".join(conditions)
+    query += " ORDER BY date_time DESC"
+    return query, [pvz_ids] + params
+
+
+def iso_timestamp_sql(column: str) -> str:
+    # Дата в том же виде, что и datetime.isoformat(): микросекунды всегда из
+    # шести цифр и опускаются, только если равны нулю. json_build_object
+    # отбрасывает нули в конце дробной части ('...47.1994')
+    return (
+        f"to_char({column}, 'YYYY-MM-DD\"T\"HH24:MI:SS') || "
+        f"CASE WHEN date_trunc('second', {column}) = {column} THEN '' "
+        f"ELSE to_char({column}, '.US') END"
+    )
 
-        if not cur.fetchone():  # Здесь мы возвращаем True если ПВЗ не существует и
-            return True  # обрабатываем это на эндпоинте в соответствии с документацией
 
-        cur.execute(
-            "(SELECT 1 FROM receptions WHERE pvz_id = %s AND status = 'in_progress')",
-            (pvz_id,),
+def build_pvz_json_query(
+    page_query: str,
+    page_params: list,
+    limit: int,
+    start_date: datetime = None,
+    end_date: datetime = None,
+) -> tuple[str, list]:
+    # Быстрый путь: дерево pvz -> receptions -> products собирается в JSON
+    # самим PostgreSQL за один запрос. В ответ попадают первые limit ПВЗ страницы,
+    # а также признак следующей страницы и ключ последнего ПВЗ для курсора
+    conditions, date_params = _reception_date_conditions(start_date, end_date)
+    reception_filter = "".join(f" AND {condition}" for condition in conditions)
+    pvz_date = iso_timestamp_sql("p.registration_date")
+    reception_date = iso_timestamp_sql("r.date_time")
+    product_date = iso_timestamp_sql("pr.date_time")
+
+    query = f"""
+    WITH page AS ({page_query}),
+    numbered AS (
+        SELECT
+            page.*,
+            row_number() OVER (ORDER BY registration_date DESC, id DESC) AS rn
+        FROM page
+    )
+    SELECT
+        coalesce(
+            json_agg(
+                json_build_object(
+                    'pvz', json_build_object(
+                        'id', p.id,
+                        'registration_date', {pvz_date},
+                        'city', p.city
+                    ),
+                    'receptions', coalesce(
+                        (
+                            SELECT json_agg(
+                                json_build_object(
+                                    'reception', json_build_object(
+                                        'id', r.id,
+                                        'date_time', {reception_date},
+                                        'pvz_id', r.pvz_id,
+                                        'status', r.status
+                                    ),
+                                    'products', coalesce(
+                                        (
+                                            SELECT json_agg(
+                                                json_build_object(
+                                                    'id', pr.id,
+                                                    'date_time', {product_date},
+                                                    'type', pr.type,
+                                                    'reception_id', pr.reception_id
+                                                )
+                                                ORDER BY pr.date_time
+                                            )
+                                            FROM products pr
+                                            WHERE pr.reception_id = r.id
+                                        ),
+                                        '[]'::json
+                                    )
+                                )
+                                ORDER BY r.date_time DESC
+                            )
+                            FROM receptions r
+                            WHERE r.pvz_id = p.id{reception_filter}
+                        ),
+                        '[]'::json
+                    )
+                )
+                ORDER BY p.rn
+            ) FILTER (WHERE p.rn <= %s),
+            '[]'::json
+        )::text,
+        count(*) > %s,
+        max(p.registration_date) FILTER (WHERE p.rn = %s),
+        (array_agg(p.id) FILTER (WHERE p.rn = %s))[1]
+    FROM numbered p
+    """
+    return query, page_params + date_params + [limit, limit, limit, limit]
+
+
+def pvz_to_dict(row) -> dict:
+    pvz_id, reg_date, city = row
+    return {
+        "id": pvz_id,
+        "registration_date": reg_date.isoformat(),
+        "city": city,
+    }
+
+
+def reception_to_dict(row) -> dict:
+    reception_id, date_time, pvz_id, status = row
+    return {
+        "id": reception_id,
+        "date_time": date_time.isoformat(),
+        "pvz_id": pvz_id,
+        "status": status,
+    }
+
+
+def product_to_dict(row) -> dict:
+    product_id, date_time, product_type, reception_id = row
+    return {
+        "id": product_id,
+        "date_time": date_time.isoformat(),
+        "type": product_type,
+        "reception_id": reception_id,
+    }
+
+
+def assemble_pvz_list(pvz_rows, reception_rows, product_rows) -> List[dict]:
+    result = []
+    receptions_by_pvz = {}
+    for row in pvz_rows:
+        item = {"pvz": pvz_to_dict(row), "receptions": []}
+        receptions_by_pvz[row[0]] = item["receptions"]
+        result.append(item)
+
+    products_by_reception = {}
+    for row in reception_rows:
+        item = {"reception": reception_to_dict(row), "products": []}
+        products_by_reception[row[0]] = item["products"]
+        receptions_by_pvz[row[2]].append(item)
+
+    for row in product_rows:
+        products_by_reception[row[3]].append(product_to_dict(row))
+
+    return result
+
+
+PVZ_CATALOG_QUERY = "SELECT id, registration_date, city FROM pvz"
+
+
+def build_pvz_catalog_query(limit: int = None, after: tuple | None = None):
+    # Каталог ПВЗ для gRPC: от старых к новым, чтобы новые ПВЗ
+    # появлялись в конце и обход каталога не пропускал их
+    query = PVZ_CATALOG_QUERY
+    params = []
+    if after:
+        query += " WHERE (registration_date, id) > (%s, %s)"
+        params.extend(after)
+    query += " ORDER BY registration_date, id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+async def _fetch_pvz_tree_async(
+    cur, pvz_rows, start_date: datetime = None, end_date: datetime = None
+) -> List[dict]:
+    # Вторая фаза: приёмки и товары страницы ПВЗ пачками
+    if not pvz_rows:
+        return []
+
+    query, params = build_receptions_query(
+        [row[0] for row in pvz_rows], start_date, end_date
+    )
+    await execute(cur, "receptions_by_pvz", query, params)
+    reception_rows = await cur.fetchall()
+
+    product_rows = []
+    if reception_rows:
+        await execute(
+            cur,
+            "products_by_reception",
+            PRODUCTS_BY_RECEPTION_QUERY,
+            ([row[0] for row in reception_rows],),
         )
-        if cur.fetchone():
-            return True
-        return False
+        product_rows = await cur.fetchall()
+
+    return assemble_pvz_list(pvz_rows, reception_rows, product_rows)
+
+
+async def get_pvz_list_async(
+    connection,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    page: int = 1,
+    limit: int = 10,
+) -> List[dict]:
+    try:
+        cur = connection.cursor()
+
+        query, params = build_pvz_page_query(start_date, end_date, page, limit)
+        await execute(cur, "pvz_page", query, params)
+        pvz_rows = await cur.fetchall()
+        return await _fetch_pvz_tree_async(cur, pvz_rows, start_date, end_date)
+
     except Exception as e:
-        logger.error(f"Ошибка при проверке активной приёмки: {e}")
+        logger.error(f"Ошибка при получении списка ПВЗ: {e}")
         raise
 
 
-def get_active_reception_id(connection, pvz_id) -> str | None:
-    conn = None
+async def get_pvz_page_async(
+    connection,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    limit: int = 10,
+    after: tuple[datetime, uuid.UUID] | None = None,
+) -> tuple[List[dict], str | None]:
+    # Keyset-пагинация по (registration_date, id): стоимость страницы не зависит
+    # от её номера. after - разобранный курсор (None - первая страница).
+    # Возвращает страницу и курсор следующей (None, если это последняя)
     try:
-        conn = connection
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id FROM receptions WHERE pvz_id = %s AND status = 'in_progress' LIMIT 1",
-            (pvz_id,),
+        cur = connection.cursor()
+
+        query, params = build_pvz_page_query(
+            start_date, end_date, limit=limit + 1, after=after
         )
-        result = cur.fetchone()
-        return result[0] if result else None
+        await execute(cur, "pvz_page", query, params)
+        pvz_rows = await cur.fetchall()
+
+        next_cursor = None
+        if len(pvz_rows) > limit:
+            pvz_rows = pvz_rows[:limit]
+            last_id, last_date, _ = pvz_rows[-1]
+            next_cursor = encode_pvz_cursor(last_date, last_id)
+
+        items = await _fetch_pvz_tree_async(cur, pvz_rows, start_date, end_date)
+        return items, next_cursor
+
     except Exception as e:
-        logger.error(f"Ошибка при поиске активной приёмки: {e}")
+        logger.error(f"Ошибка при получении страницы ПВЗ: {e}")
         raise
 
 
-def get_last_product_id(connection, pvz_id) -> str | None:
-    conn = None
+async def get_pvz_json_async(
+    connection,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    page: int = 1,
+    limit: int = 10,
+    keyset: bool = False,
+    after: tuple[datetime, uuid.UUID] | None = None,
+) -> tuple[str, str | None]:
+    # То же, что get_pvz_list_async / get_pvz_page_async, но возвращает готовый
+    # JSON массив ПВЗ (текстом) без сборки словарей в Python.
+    # При keyset используется keyset-пагинация после after и вычисляется next_cursor
     try:
-        conn = connection
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT p.id 
-            FROM products p
-            JOIN receptions r ON p.reception_id = r.id
-            WHERE r.pvz_id = %s AND r.status = 'in_progress'
-            ORDER BY p.date_time DESC
-            LIMIT 1
-            """,
-            (pvz_id,),
+        cur = connection.cursor()
+
+        if not keyset:
+            page_query, page_params = build_pvz_page_query(
+                start_date, end_date, page, limit
+            )
+        else:
+            page_query, page_params = build_pvz_page_query(
+                start_date, end_date, limit=limit + 1, after=after
+            )
+        query, params = build_pvz_json_query(
+            page_query, page_params, limit, start_date, end_date
         )
-        result = cur.fetchone()
-        return result[0] if result else None
+        await execute(cur, "pvz_json", query, params)
+        items_json, has_more, last_date, last_id = await cur.fetchone()
+
+        next_cursor = None
+        if keyset and has_more:
+            next_cursor = encode_pvz_cursor(last_date, last_id)
+        return items_json, next_cursor
+
     except Exception as e:
-        logger.error(f"Ошибка при поиске последнего товара: {e}")
+        logger.error(f"Ошибка при получении списка ПВЗ (JSON из БД): {e}")
         raise
 
 
-def get_pvz_list(
+EXPORT_ROWS_QUERY = """
+    SELECT
+        pvz.id,
+        pvz.registration_date,
+        pvz.city,
+        r.id,
+        r.date_time,
+        r.status,
+        pr.id,
+        pr.date_time,
+        pr.type
+    FROM pvz
+    LEFT JOIN receptions r ON pvz.id = r.pvz_id
+    LEFT JOIN products pr ON r.id = pr.reception_id
+"""
+
+EXPORT_COLUMNS = [
+    "pvz_id",
+    "registration_date",
+    "city",
+    "reception_id",
+    "reception_date",
+    "status",
+    "product_id",
+    "product_date",
+    "product_type",
+]
+
+
+def build_export_query(
+    start_date: datetime = None, end_date: datetime = None, city: str = None
+) -> tuple[str, list]:
+    # Строки join в порядке ПВЗ -> приёмка -> товар, как в списке ПВЗ.
+    # Фильтр по дате, как и в GET /pvz, относится к приёмкам
+    conditions, params = _reception_date_conditions(start_date, end_date)
+    if city:
+        conditions.append("pvz.city = %s")
+        params.append(city)
+
+    query = EXPORT_ROWS_QUERY
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += """
+    ORDER BY pvz.registration_date DESC, pvz.id DESC,
+        r.date_time DESC, r.id, pr.date_time, pr.id
+    """
+    return query, params
+
+
+async def iter_export_rows_async(
     connection,
     start_date: datetime = None,
     end_date: datetime = None,
-    page: int = 1,
-    limit: int = 10,
-) -> List[dict]:
-    conn = None
+    city: str = None,
+    batch_size: int = 2000,
+) -> AsyncIterator[tuple]:
+    # Серверный (именованный) курсор: строки приходят из БД пачками по batch_size,
+    # поэтому память не зависит от размера таблиц. Открытие курсора и чтение
+    # каждой пачки замеряются отдельно
+    query, params = build_export_query(start_date, end_date, city)
     try:
-        conn = connection
-        cur = conn.cursor()
-
-        query = """
-        SELECT 
-            pvz.id AS pvz_id,
-            pvz.registration_date,
-            pvz.city,
-            r.id AS reception_id,
-            r.date_time AS reception_date,
-            r.status,
-            pr.id AS product_id,
-            pr.date_time AS product_date,
-            pr.type
-        FROM pvz
-        LEFT JOIN receptions r ON pvz.id = r.pvz_id
-        LEFT JOIN products pr ON r.id = pr.reception_id
-        """
-
-        conditions = []
-        params = []
-
-        if start_date:
-            conditions.append("r.date_time >= %s")
-            params.append(start_date)
-        if end_date:
-            conditions.append("r.date_time <= %s")
-            params.append(end_date)
-
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-
-        query += """
-        ORDER BY pvz.registration_date DESC, r.date_time DESC
-        LIMIT %s OFFSET %s
-        """
-        params.extend([limit, (page - 1) * limit])
+        async with connection.cursor(name="pvz_export") as cur:
+            await execute(cur, "export_rows", query, params)
+            while True:
+                with timed_query("export_rows_fetch"):
+                    rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+    except Exception as e:
+        logger.error(f"Ошибка при выгрузке ПВЗ: {e}")
+        raise
 
-        cur.execute(query, params)
-        rows = cur.fetchall()
-
-        result = []
-        current_pvz = None
-        current_reception = None
-
-        for row in rows:
-            (
-                pvz_id,
-                reg_date,
-                city,
-                reception_id,
-                reception_date,
-                status,
-                product_id,
-                product_date,
-                product_type,
-            ) = row
-
-            if not current_pvz or current_pvz["pvz"]["id"] != pvz_id:
-                current_pvz = {
-                    "pvz": {
-                        "id": pvz_id,
-                        "registration_date": reg_date.isoformat(),
-                        "city": city,
-                    },
-                    "receptions": [],
-                }
-                result.append(current_pvz)
-
-            if reception_id and (
-                not current_reception
-                or current_reception["reception"]["id"] != reception_id
-            ):
-                current_reception = {
-                    "reception": {
-                        "id": reception_id,
-                        "date_time": reception_date.isoformat(),
-                        "pvz_id": current_pvz["pvz"]["id"],
-                        "status": status,
-                    },
-                    "products": [],
-                }
-                current_pvz["receptions"].append(current_reception)
-
-            if product_id:
-                current_reception["products"].append(
-                    {
-                        "id": product_id,
-                        "date_time": product_date.isoformat(),
-                        "type": product_type,
-                        "reception_id": current_reception["reception"]["id"],
-                    }
-                )
 
-        return result
+async def iter_pvz_tree_async(rows: AsyncIterator[tuple]) -> AsyncIterator[dict]:
+    # Сворачивает упорядоченные строки join в элементы списка ПВЗ (как в GET /pvz)
+    # и отдаёт каждый ПВЗ, как только пришли все его строки
+    current_pvz = None
+    current_reception = None
+
+    async for row in rows:
+        pvz_row, reception_row, product_row = row[0:3], row[3:6], row[6:9]
+
+        if not current_pvz or current_pvz["pvz"]["id"] != pvz_row[0]:
+            if current_pvz:
+                yield current_pvz
+            current_pvz = {"pvz": pvz_to_dict(pvz_row), "receptions": []}
+            current_reception = None
+
+        if reception_row[0] and (
+            not current_reception
+            or current_reception["reception"]["id"] != reception_row[0]
+        ):
+            reception_id, date_time, status = reception_row
+            current_reception = {
+                "reception": reception_to_dict(
+                    (reception_id, date_time, pvz_row[0], status)
+                ),
+                "products": [],
+            }
+            current_pvz["receptions"].append(current_reception)
+
+        if product_row[0]:
+            product_id, date_time, product_type = product_row
+            current_reception["products"].append(
+                product_to_dict((product_id, date_time, product_type, reception_row[0]))
+            )
+
+    if current_pvz:
+        yield current_pvz
+
+
+async def get_pvz_catalog_page_async(
+    connection, page_size: int, page_token: str = ""
+) -> tuple[list, str]:
+    # Каталог ПВЗ для gRPC: строки (id, registration_date, city) и токен следующей
+    # страницы (пустая строка на последней). ValueError - повреждённый токен
+    after = decode_pvz_cursor(page_token) if page_token else None
+    try:
+        cur = connection.cursor()
+        query, params = build_pvz_catalog_query(page_size + 1, after)
+        await execute(cur, "pvz_catalog_page", query, params)
+        rows = await cur.fetchall()
+
+        next_token = ""
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last_id, last_date, _ = rows[-1]
+            next_token = encode_pvz_cursor(last_date, last_id)
+        return rows, next_token
+    except Exception as e:
+        logger.error(f"Ошибка при получении страницы каталога ПВЗ: {e}")
+        raise
 
+
+async def iter_pvz_catalog_async(connection, chunk_size: int) -> AsyncIterator[list]:
+    # Весь каталог пачками по chunk_size строк через серверный курсор
+    try:
+        async with connection.cursor(name="pvz_catalog") as cur:
+            query, params = build_pvz_catalog_query()
+            await execute(cur, "pvz_catalog", query, params)
+            while True:
+                with timed_query("pvz_catalog_fetch"):
+                    rows = await cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
     except Exception as e:
-        logger.error(f"Ошибка при получении списка ПВЗ: {e}")
+        logger.error(f"Ошибка при выгрузке каталога ПВЗ: {e}")
         raise
@@ -7,16 +7,22 @@ def run():
     channel = grpc.insecure_channel("localhost:3000")
     stub = pvz_pb2_grpc.PVZServiceStub(channel)
 
-    request = pvz_pb2.GetPVZListRequest()
-
-    response = stub.GetPVZList(request)
-
-    for pvz in response.pvzs:
-        print(f"ID: {pvz.id}")
-        print(f"City: {pvz.city}")
-
-        dt = pvz.registration_date.ToDatetime()
-        print(f"Date: {dt.isoformat()}\n")
+    # Обходим каталог постранично, пока сервер возвращает next_page_token
+    page_token = ""
+    while True:
+        request = pvz_pb2.GetPVZListRequest(page_size=100, page_token=page_token)
+        response = stub.GetPVZList(request)
+
+        for pvz in response.pvzs:
+            print(f"ID: {pvz.id}")
+            print(f"City: {pvz.city}")
+
+            dt = pvz.registration_date.ToDatetime()
+            print(f"Date: {dt.isoformat()}\n")
+
+        page_token = response.next_page_token
+        if not page_token:
+            break
 
 
 if __name__ == "__main__":
@@ -1,41 +1,141 @@
-from concurrent import futures
+import asyncio
 import grpc
-import signal
+import multiprocessing
 import os
-import psycopg2
+import signal
+import uuid
+from prometheus_client import multiprocess
 from google.protobuf.timestamp_pb2 import Timestamp
 from app.grpc.pvz_v1 import pvz_pb2, pvz_pb2_grpc
-from app.security import settings
-from app.logger import logger
+from app.security import settings, decode_role
+from app.logger import logger, new_request_id, request_id_var, start_log_server
+from app import operations
+from app.operations import (
+    OperationError,
+    AccessDenied,
+    InvalidArgument,
+    FailedPrecondition,
+    NotFound,
+)
+from app.database import (
+    async_db_session,
+    async_read_session,
+    close_async_pool,
+    close_replica_pool,
+    get_pvz_catalog_page_async,
+    iter_pvz_catalog_async,
+    open_async_pool,
+)
 
 
-class PVZService(pvz_pb2_grpc.PVZServiceServicer):
-    def GetPVZList(self, request, context):
-        conn = None
-        try:
-            conn = psycopg2.connect(
-                host=settings.DB_HOST,
-                port=settings.DB_PORT,
-                user=settings.DB_USER,
-                password=settings.DB_PASSWORD,
-                dbname=settings.DB_NAME,
-            )
-            cur = conn.cursor()
-            cur.execute("SELECT id, registration_date, city FROM pvz")
-            rows = cur.fetchall()
+def build_pvz_response(rows, next_page_token: str = "") -> pvz_pb2.GetPVZListResponse:
+    response = pvz_pb2.GetPVZListResponse(next_page_token=next_page_token)
+    for row in rows:
+        pvz = response.pvzs.add()
+        pvz.id = str(row[0])
+
+        timestamp = Timestamp()
+        timestamp.FromDatetime(row[1])
+        pvz.registration_date.CopyFrom(timestamp)
+
+        pvz.city = row[2]
+    return response
+
+
+def build_timestamp(value) -> Timestamp:
+    timestamp = Timestamp()
+    timestamp.FromDatetime(value)
+    return timestamp
+
+
+RECEPTION_STATUSES = {
+    "in_progress": pvz_pb2.RECEPTION_STATUS_IN_PROGRESS,
+    "close": pvz_pb2.RECEPTION_STATUS_CLOSED,
+}
+
+
+def build_reception(reception: dict) -> pvz_pb2.Reception:
+    return pvz_pb2.Reception(
+        id=str(reception["id"]),
+        date_time=build_timestamp(reception["date_time"]),
+        pvz_id=str(reception["pvz_id"]),
+        status=RECEPTION_STATUSES[reception["status"]],
+    )
+
 
-            response = pvz_pb2.GetPVZListResponse()
-            for row in rows:
-                pvz = response.pvzs.add()
-                pvz.id = str(row[0])
+OPERATION_STATUS_CODES = {
+    AccessDenied: grpc.StatusCode.PERMISSION_DENIED,
+    InvalidArgument: grpc.StatusCode.INVALID_ARGUMENT,
+    FailedPrecondition: grpc.StatusCode.FAILED_PRECONDITION,
+    NotFound: grpc.StatusCode.NOT_FOUND,
+}
 
-                timestamp = Timestamp()
-                timestamp.FromDatetime(row[1])
-                pvz.registration_date.CopyFrom(timestamp)
 
-                pvz.city = row[2]
+def set_request_id(context):
+    # Каждый RPC выполняется в своей задаче, поэтому id не смешиваются
+    for key, value in context.invocation_metadata():
+        if key == "x-request-id" and value and len(value) <= 128:
+            request_id_var.set(value)
+            return
+    request_id_var.set(new_request_id())
 
-            return response
+
+def get_role(context) -> str:
+    # Тот же JWT, что и для REST, но в метаданных вместо заголовка HTTP
+    for key, value in context.invocation_metadata():
+        if key == "authorization" and value.startswith("Bearer "):
+            try:
+                return decode_role(value[len("Bearer ") :])
+            except Exception:
+                break
+    raise AccessDenied("Доступ запрещён")
+
+
+def parse_pvz_id(value: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise InvalidArgument("Некорректный pvz_id")
+
+
+async def run_operation(context, method: str, operation, pvz_id: str, *args):
+    # Ошибки операций переводятся в статусы gRPC; abort вызывается вне try,
+    # так как AbortError - тоже Exception
+    set_request_id(context)
+    try:
+        role = get_role(context)
+        pvz_id = parse_pvz_id(pvz_id)
+        async with async_db_session() as conn:
+            return await operation(conn, role, pvz_id, *args)
+    except OperationError as e:
+        code, details = OPERATION_STATUS_CODES[type(e)], e.detail
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении gRPC запроса {method} ", exc_info=True)
+        code, details = grpc.StatusCode.INTERNAL, f"Error: {str(e)}"
+    await context.abort(code, details)
+
+
+def resolve_page_size(requested: int) -> int:
+    if requested <= 0:
+        return settings.GRPC_PVZ_PAGE_SIZE
+    return min(requested, settings.GRPC_PVZ_MAX_PAGE_SIZE)
+
+
+class PVZService(pvz_pb2_grpc.PVZServiceServicer):
+    async def GetPVZList(self, request, context):
+        set_request_id(context)
+        page_size = resolve_page_size(request.page_size)
+        try:
+            async with async_read_session() as conn:
+                rows, next_page_token = await get_pvz_catalog_page_async(
+                    conn, page_size, request.page_token
+                )
+            return build_pvz_response(rows, next_page_token)
+
+        except ValueError:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Некорректный page_token")
+            return pvz_pb2.GetPVZListResponse()
 
         except Exception as e:
             logger.error(
@@ -45,26 +145,162 @@ class PVZService(pvz_pb2_grpc.PVZServiceServicer):
             context.set_details(f"Error: {str(e)}")
             return pvz_pb2.GetPVZListResponse()
 
+    async def StreamPVZList(self, request, context):
+        set_request_id(context)
+        chunk_size = resolve_page_size(request.chunk_size)
+        try:
+            async with async_read_session() as conn:
+                async for rows in iter_pvz_catalog_async(conn, chunk_size):
+                    yield build_pvz_response(rows)
 
-def serve():
-    server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=10), options=(("grpc.so_reuseport", 0),)
+        except Exception as e:
+            logger.error(
+                "Ошибка при выполнении gRPC запроса StreamPVZList ", exc_info=True
+            )
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Error: {str(e)}")
+
+    async def CreateReception(self, request, context):
+        reception = await run_operation(
+            context,
+            "CreateReception",
+            operations.create_reception,
+            request.pvz_id,
+        )
+        return build_reception(reception)
+
+    async def CloseReception(self, request, context):
+        reception = await run_operation(
+            context,
+            "CloseReception",
+            operations.close_last_reception,
+            request.pvz_id,
+        )
+        return build_reception(reception)
+
+    async def DeleteLastProduct(self, request, context):
+        product_id = await run_operation(
+            context,
+            "DeleteLastProduct",
+            operations.delete_last_product,
+            request.pvz_id,
+        )
+        return pvz_pb2.DeleteLastProductResponse(product_id=str(product_id))
+
+    async def AddProducts(self, request_iterator, context):
+        # Соединение берётся из пула на каждый товар, а не на весь поток:
+        # сканер может держать поток открытым долго. Поэтому и в ответе
+        # копятся только id товаров, а не целые сообщения
+        response = pvz_pb2.AddProductsResponse()
+        pvz_id = ""
+        async for request in request_iterator:
+            if request.pvz_id:
+                pvz_id = request.pvz_id
+            product = await run_operation(
+                context,
+                "AddProducts",
+                operations.add_product,
+                pvz_id,
+                request.type,
+            )
+            response.product_ids.append(str(product["id"]))
+        response.count = len(response.product_ids)
+        return response
+
+
+def server_options() -> list[tuple[str, int]]:
+    return [
+        # Несколько процессов слушают один порт, ядро распределяет между ними соединения
+        ("grpc.so_reuseport", 1),
+        ("grpc.max_concurrent_streams", settings.GRPC_MAX_CONCURRENT_STREAMS),
+        ("grpc.keepalive_time_ms", settings.GRPC_KEEPALIVE_TIME_MS),
+        ("grpc.keepalive_timeout_ms", settings.GRPC_KEEPALIVE_TIMEOUT_MS),
+        ("grpc.keepalive_permit_without_calls", 1),
+        (
+            "grpc.http2.min_ping_interval_without_data_ms",
+            settings.GRPC_KEEPALIVE_TIME_MS,
+        ),
+    ]
+
+
+def create_server(port: int = None) -> grpc.aio.Server:
+    # Сервер создаётся внутри работающего event loop процесса-воркера
+    server = grpc.aio.server(
+        options=server_options(),
+        maximum_concurrent_rpcs=settings.GRPC_MAX_CONCURRENT_RPCS or None,
     )
     pvz_pb2_grpc.add_PVZServiceServicer_to_server(PVZService(), server)
-    server.add_insecure_port("[::]:3000")
-    server.start()
+    server.add_insecure_port(f"[::]:{port or settings.GRPC_PORT}")
+    return server
+
+
+async def serve_worker(worker_id: int):
+    # У каждого процесса свой event loop и свой асинхронный пул соединений
+    await open_async_pool()
+    server = create_server()
+    await server.start()
+    logger.info(f"gRPC воркер {worker_id} запущен на порте {settings.GRPC_PORT}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await stop_event.wait()
+    logger.info(f"Остановка gRPC воркера {worker_id}...")
+    await server.stop(settings.GRPC_SHUTDOWN_GRACE_SECONDS)
+    await close_async_pool()
+    await close_replica_pool()
+
+
+def run_worker(worker_id: int):
+    asyncio.run(serve_worker(worker_id))
 
-    logger.info("gRPC сервер запущен на порте 3000")
+
+def start_grpc_metrics():
+    # Под супервизором (PROMETHEUS_MULTIPROC_DIR уже задан) метрики воркеров
+    # отдаёт его сервер метрик. Иначе каталог и сервер метрик свои: воркеры
+    # запускаются через spawn и наследуют переменную окружения
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    from app.server import prepare_multiproc_dir, start_metrics_server
+
+    prepare_multiproc_dir(settings.GRPC_PROMETHEUS_MULTIPROC_DIR)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.GRPC_PROMETHEUS_MULTIPROC_DIR
+    start_metrics_server(settings.GRPC_METRICS_PORT)
+    logger.info(
+        f"Сервер с метриками gRPC на порту {settings.GRPC_METRICS_PORT} запущен"
+    )
+
+
+def serve():
+    # Воркеры запускаются через spawn: gRPC не поддерживает fork после инициализации
+    context = multiprocessing.get_context("spawn")
+    start_log_server()
+    start_grpc_metrics()
+    workers = [
+        context.Process(target=run_worker, args=(worker_id,), name=f"grpc-{worker_id}")
+        for worker_id in range(max(settings.GRPC_WORKERS, 1))
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(
+        f"gRPC сервер запущен на порте {settings.GRPC_PORT}, воркеров: {len(workers)}"
+    )
 
     def stop(signum, frame):
         logger.info("Остановка gRPC сервера...")
-        server.stop(0)
-        os._exit(0)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
 
     signal.signal(signal.SIGINT, stop)
     signal.signal(signal.SIGTERM, stop)
 
-    server.wait_for_termination()
+    for worker in workers:
+        worker.join()
+        # Gauge остановленного воркера больше не учитываются
+        multiprocess.mark_process_dead(worker.pid)
 
 
 if __name__ == "__main__":
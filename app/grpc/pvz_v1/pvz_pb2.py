@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tpvz.proto\x12\x06pvz.v1\x1a\x1fgoogle/protobuf/timestamp.proto\"V\n\x03PVZ\x12\n\n\x02id\x18\x01 \x01(\t\x12\x35\n\x11registration_date\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x0c\n\x04\x63ity\x18\x03 \x01(\t\"\x13\n\x11GetPVZListRequest\"/\n\x12GetPVZListResponse\x12\x19\n\x04pvzs\x18\x01 \x03(\x0b\x32\x0b.pvz.v1.PVZ*P\n\x0fReceptionStatus\x12 \n\x1cRECEPTION_STATUS_IN_PROGRESS\x10\x00\x12\x1b\n\x17RECEPTION_STATUS_CLOSED\x10\x01\x32Q\n\nPVZService\x12\x43\n\nGetPVZList\x12\x19.pvz.v1.GetPVZListRequest\x1a\x1a.pvz.v1.GetPVZListResponseBCZAgithub.com/y0rikkk/avito-backend-assigment/app/grpc/pvz_v1;pvz_v1b\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\tpvz.proto\x12\x06pvz.v1\x1a\x1fgoogle/protobuf/timestamp.proto\"V\n\x03PVZ\x12\n\n\x02id\x18\x01 \x01(\t\x12\x35\n\x11registration_date\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x0c\n\x04\x63ity\x18\x03 \x01(\t\":\n\x11GetPVZListRequest\x12\x11\n\tpage_size\x18\x01 \x01(\x05\x12\x12\n\npage_token\x18\x02 \x01(\t\"H\n\x12GetPVZListResponse\x12\x19\n\x04pvzs\x18\x01 \x03(\x0b\x32\x0b.pvz.v1.PVZ\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"*\n\x14StreamPVZListRequest\x12\x12\n\nchunk_size\x18\x01 \x01(\x05\"\x7f\n\tReception\x12\n\n\x02id\x18\x01 \x01(\t\x12-\n\tdate_time\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x0e\n\x06pvz_id\x18\x03 \x01(\t\x12\'\n\x06status\x18\x04 \x01(\x0e\x32\x17.pvz.v1.ReceptionStatus\"(\n\x16\x43reateReceptionRequest\x12\x0e\n\x06pvz_id\x18\x01 \x01(\t\"\'\n\x15\x43loseReceptionRequest\x12\x0e\n\x06pvz_id\x18\x01 \x01(\t\"*\n\x18\x44\x65leteLastProductRequest\x12\x0e\n\x06pvz_id\x18\x01 \x01(\t\"/\n\x19\x44\x65leteLastProductResponse\x12\x12\n\nproduct_id\x18\x01 \x01(\t\"1\n\x11\x41\x64\x64ProductRequest\x12\x0e\n\x06pvz_id\x18\x01 \x01(\t\x12\x0c\n\x04type\x18\x02 \x01(\t\"9\n\x13\x41\x64\x64ProductsResponse\x12\r\n\x05\x63ount\x18\x01 \x01(\x05\x12\x13\n\x0bproduct_ids\x18\x02 \x03(\t*r\n\x0fReceptionStatus\x12 \n\x1cRECEPTION_STATUS_UNSPECIFIED\x10\x00\x12 \n\x1cRECEPTION_STATUS_IN_PROGRESS\x10\x01\x12\x1b\n\x17RECEPTION_STATUS_CLOSED\x10\x02\x32\xcb\x03\n\nPVZService\x12\x43\n\nGetPVZList\x12\x19.pvz.v1.GetPVZListRequest\x1a\x1a.pvz.v1.GetPVZListResponse\x12K\n\rStreamPVZList\x12\x1c.pvz.v1.StreamPVZListRequest\x1a\x1a.pvz.v1.GetPVZListResponse0\x01\x12\x44\n\x0f\x43reateReception\x12\x1e.pvz.v1.CreateReceptionRequest\x1a\x11.pvz.v1.Reception\x12\x42\n\x0e\x43loseReception\x12\x1d.pvz.v1.CloseReceptionRequest\x1a\x11.pvz.v1.Reception\x12X\n\x11\x44\x65leteLastProduct\x12 .pvz.v1.DeleteLastProductRequest\x1a!.pvz.v1.DeleteLastProductResponse\x12G\n\x0b\x41\x64\x64Products\x12\x19.pvz.v1.AddProductRequest\x1a\x1b.pvz.v1.AddProductsResponse(\x01\x42\x43ZAgithub.com/y0rikkk/avito-backend-assigment/app/grpc/pvz_v1;pvz_v1b\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,14 +33,30 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'pvz_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'ZAgithub.com/y0rikkk/avito-backend-assigment/app/grpc/pvz_v1;pvz_v1'
-  _globals['_RECEPTIONSTATUS']._serialized_start=212
-  _globals['_RECEPTIONSTATUS']._serialized_end=292
+  _globals['_RECEPTIONSTATUS']._serialized_start=735
+  _globals['_RECEPTIONSTATUS']._serialized_end=849
   _globals['_PVZ']._serialized_start=54
   _globals['_PVZ']._serialized_end=140
   _globals['_GETPVZLISTREQUEST']._serialized_start=142
-  _globals['_GETPVZLISTREQUEST']._serialized_end=161
-  _globals['_GETPVZLISTRESPONSE']._serialized_start=163
-  _globals['_GETPVZLISTRESPONSE']._serialized_end=210
-  _globals['_PVZSERVICE']._serialized_start=294
-  _globals['_PVZSERVICE']._serialized_end=375
+  _globals['_GETPVZLISTREQUEST']._serialized_end=200
+  _globals['_GETPVZLISTRESPONSE']._serialized_start=202
+  _globals['_GETPVZLISTRESPONSE']._serialized_end=274
+  _globals['_STREAMPVZLISTREQUEST']._serialized_start=276
+  _globals['_STREAMPVZLISTREQUEST']._serialized_end=318
+  _globals['_RECEPTION']._serialized_start=320
+  _globals['_RECEPTION']._serialized_end=447
+  _globals['_CREATERECEPTIONREQUEST']._serialized_start=449
+  _globals['_CREATERECEPTIONREQUEST']._serialized_end=489
+  _globals['_CLOSERECEPTIONREQUEST']._serialized_start=491
+  _globals['_CLOSERECEPTIONREQUEST']._serialized_end=530
+  _globals['_DELETELASTPRODUCTREQUEST']._serialized_start=532
+  _globals['_DELETELASTPRODUCTREQUEST']._serialized_end=574
+  _globals['_DELETELASTPRODUCTRESPONSE']._serialized_start=576
+  _globals['_DELETELASTPRODUCTRESPONSE']._serialized_end=623
+  _globals['_ADDPRODUCTREQUEST']._serialized_start=625
+  _globals['_ADDPRODUCTREQUEST']._serialized_end=674
+  _globals['_ADDPRODUCTSRESPONSE']._serialized_start=676
+  _globals['_ADDPRODUCTSRESPONSE']._serialized_end=733
+  _globals['_PVZSERVICE']._serialized_start=852
+  _globals['_PVZSERVICE']._serialized_end=1311
 # @@protoc_insertion_point(module_scope)
@@ -43,17 +43,84 @@ class PVZServiceStub(object):
             response_deserializer=pvz__pb2.GetPVZListResponse.FromString,
             _registered_method=True,
         )
+        self.StreamPVZList = channel.unary_stream(
+            "/pvz.v1.PVZService/StreamPVZList",
+            request_serializer=pvz__pb2.StreamPVZListRequest.SerializeToString,
+            response_deserializer=pvz__pb2.GetPVZListResponse.FromString,
+            _registered_method=True,
+        )
+        self.CreateReception = channel.unary_unary(
+            "/pvz.v1.PVZService/CreateReception",
+            request_serializer=pvz__pb2.CreateReceptionRequest.SerializeToString,
+            response_deserializer=pvz__pb2.Reception.FromString,
+            _registered_method=True,
+        )
+        self.CloseReception = channel.unary_unary(
+            "/pvz.v1.PVZService/CloseReception",
+            request_serializer=pvz__pb2.CloseReceptionRequest.SerializeToString,
+            response_deserializer=pvz__pb2.Reception.FromString,
+            _registered_method=True,
+        )
+        self.DeleteLastProduct = channel.unary_unary(
+            "/pvz.v1.PVZService/DeleteLastProduct",
+            request_serializer=pvz__pb2.DeleteLastProductRequest.SerializeToString,
+            response_deserializer=pvz__pb2.DeleteLastProductResponse.FromString,
+            _registered_method=True,
+        )
+        self.AddProducts = channel.stream_unary(
+            "/pvz.v1.PVZService/AddProducts",
+            request_serializer=pvz__pb2.AddProductRequest.SerializeToString,
+            response_deserializer=pvz__pb2.AddProductsResponse.FromString,
+            _registered_method=True,
+        )
 
 
 class PVZServiceServicer(object):
     """Missing associated documentation comment in .proto file."""
 
     def GetPVZList(self, request, context):
+        """Страница каталога ПВЗ в порядке (registration_date, id).
+        Следующая страница запрашивается с page_token из next_page_token
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def StreamPVZList(self, request, context):
+        """Весь каталог ПВЗ потоком сообщений по chunk_size ПВЗ в каждом"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def CreateReception(self, request, context):
+        """Методы приёмки товаров требуют роль employee: JWT передаётся
+        в метаданных запроса как "authorization: Bearer <token>"
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def CloseReception(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details("Method not implemented!")
         raise NotImplementedError("Method not implemented!")
 
+    def DeleteLastProduct(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
+    def AddProducts(self, request_iterator, context):
+        """Поток товаров в активную приёмку ПВЗ. Каждый товар сохраняется сразу,
+        при ошибке поток прерывается, уже добавленные товары остаются.
+        В ответе только число товаров и их id: поток может быть долгим
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details("Method not implemented!")
+        raise NotImplementedError("Method not implemented!")
+
 
 def add_PVZServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -62,6 +129,31 @@ def add_PVZServiceServicer_to_server(servicer, server):
             request_deserializer=pvz__pb2.GetPVZListRequest.FromString,
             response_serializer=pvz__pb2.GetPVZListResponse.SerializeToString,
         ),
+        "StreamPVZList": grpc.unary_stream_rpc_method_handler(
+            servicer.StreamPVZList,
+            request_deserializer=pvz__pb2.StreamPVZListRequest.FromString,
+            response_serializer=pvz__pb2.GetPVZListResponse.SerializeToString,
+        ),
+        "CreateReception": grpc.unary_unary_rpc_method_handler(
+            servicer.CreateReception,
+            request_deserializer=pvz__pb2.CreateReceptionRequest.FromString,
+            response_serializer=pvz__pb2.Reception.SerializeToString,
+        ),
+        "CloseReception": grpc.unary_unary_rpc_method_handler(
+            servicer.CloseReception,
+            request_deserializer=pvz__pb2.CloseReceptionRequest.FromString,
+            response_serializer=pvz__pb2.Reception.SerializeToString,
+        ),
+        "DeleteLastProduct": grpc.unary_unary_rpc_method_handler(
+            servicer.DeleteLastProduct,
+            request_deserializer=pvz__pb2.DeleteLastProductRequest.FromString,
+            response_serializer=pvz__pb2.DeleteLastProductResponse.SerializeToString,
+        ),
+        "AddProducts": grpc.stream_unary_rpc_method_handler(
+            servicer.AddProducts,
+            request_deserializer=pvz__pb2.AddProductRequest.FromString,
+            response_serializer=pvz__pb2.AddProductsResponse.SerializeToString,
+        ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
         "pvz.v1.PVZService", rpc_method_handlers
@@ -103,3 +195,153 @@ class PVZService(object):
             metadata,
             _registered_method=True,
         )
+
+    @staticmethod
+    def StreamPVZList(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            "/pvz.v1.PVZService/StreamPVZList",
+            pvz__pb2.StreamPVZListRequest.SerializeToString,
+            pvz__pb2.GetPVZListResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
+
+    @staticmethod
+    def CreateReception(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/pvz.v1.PVZService/CreateReception",
+            pvz__pb2.CreateReceptionRequest.SerializeToString,
+            pvz__pb2.Reception.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
+
+    @staticmethod
+    def CloseReception(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/pvz.v1.PVZService/CloseReception",
+            pvz__pb2.CloseReceptionRequest.SerializeToString,
+            pvz__pb2.Reception.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
+
+    @staticmethod
+    def DeleteLastProduct(
+        request,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            "/pvz.v1.PVZService/DeleteLastProduct",
+            pvz__pb2.DeleteLastProductRequest.SerializeToString,
+            pvz__pb2.DeleteLastProductResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
+
+    @staticmethod
+    def AddProducts(
+        request_iterator,
+        target,
+        options=(),
+        channel_credentials=None,
+        call_credentials=None,
+        insecure=False,
+        compression=None,
+        wait_for_ready=None,
+        timeout=None,
+        metadata=None,
+    ):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            "/pvz.v1.PVZService/AddProducts",
+            pvz__pb2.AddProductRequest.SerializeToString,
+            pvz__pb2.AddProductsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True,
+        )
@@ -1,15 +1,46 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import pickle
+import queue
+import random
+import socketserver
+import struct
+import tempfile
+import threading
+import uuid
+from contextvars import ContextVar
 from pathlib import Path
 from datetime import datetime
 import sys
+from app.config import settings
 
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
 
-LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-LOG_FILE = LOG_DIR / f"backend_{datetime.now().strftime('%Y-%m-%d')}.log"
+# Текущий файл, при ротации в полночь переименовывается в backend.log.ГГГГ-ММ-ДД
+LOG_FILE = LOG_DIR / "backend.log"
+
+# id запроса (заголовок X-Request-ID), выставляется middleware в app/main.py
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Файл лога пишет один процесс: у TimedRotatingFileHandler каждого процесса
+# своя ротация, и в полночь второй процесс удалил бы архив, только что
+# созданный первым. Процесс, запускающий остальные (супервизор, gRPC сервер),
+# вызывает start_log_server, а его дочерние процессы отправляют записи через
+# Unix-сокет, путь к которому получают в этой переменной окружения
+LOG_SERVER_ENV = "LOG_SERVER_SOCKET"
+
+_file_handler = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
 
 
 class ErrorFilter(logging.Filter):
@@ -17,20 +48,170 @@ class ErrorFilter(logging.Filter):
         return record.levelno >= logging.ERROR
 
 
+class RequestIdFilter(logging.Filter):
+    # Выполняется в потоке/задаче, которая пишет в лог, до постановки в очередь:
+    # в потоке QueueListener контекста запроса уже нет
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    # Из частых info-сообщений в лог попадает доля rate, предупреждения и
+    # ошибки пишутся всегда
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    # Как QueueHandler, но трейсбек остаётся отдельным полем exc_text,
+    # а не дописывается в сообщение - для JSON формата
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+def build_formatter() -> logging.Formatter:
+    if settings.LOG_JSON:
+        return JsonFormatter()
+    return logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+
+def build_file_handler() -> logging.Handler:
+    global _file_handler
+    if _file_handler is None:
+        _file_handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE,
+            when=settings.LOG_ROTATE_WHEN,
+            backupCount=settings.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        _file_handler.setFormatter(build_formatter())
+    return _file_handler
+
+
+def build_output_handler() -> logging.Handler:
+    # Дочерний процесс отправляет записи владельцу файла, остальные пишут сами
+    socket_path = os.environ.get(LOG_SERVER_ENV)
+    if socket_path:
+        return logging.handlers.SocketHandler(socket_path, None)
+    return build_file_handler()
+
+
+class LogRecordReceiver(socketserver.StreamRequestHandler):
+    # Формат logging.handlers.SocketHandler: длина (4 байта) и pickle словаря
+    # записи. Сокет доступен только владельцу (0600)
+    def handle(self):
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4:
+                return
+            (length,) = struct.unpack(">L", header)
+            data = self.rfile.read(length)
+            if len(data) < length:
+                return
+            record = logging.makeLogRecord(pickle.loads(data))
+            self.server.output_handler.handle(record)
+
+
+def create_log_server(path: str, output_handler: logging.Handler):
+    if os.path.exists(path):
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, LogRecordReceiver)
+    server.daemon_threads = True
+    server.output_handler = output_handler
+    os.chmod(path, 0o600)
+    threading.Thread(
+        target=server.serve_forever, name="log-server", daemon=True
+    ).start()
+    return server
+
+
+def start_log_server():
+    # Вызывается до запуска дочерних процессов. Если этот процесс сам
+    # дочерний, записи уже уходят владельцу файла
+    if os.environ.get(LOG_SERVER_ENV):
+        return
+    path = os.path.join(tempfile.gettempdir(), f"pvz-log-{os.getpid()}.sock")
+    server = create_log_server(path, build_file_handler())
+    os.environ[LOG_SERVER_ENV] = path
+    owner_pid = os.getpid()
+
+    def stop():
+        # atexit наследуется через fork, а поток сервера - нет
+        if os.getpid() != owner_pid:
+            return
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+
+    atexit.register(stop)
+
+
 def setup_logger():
+    # Запись в файл и консоль выполняет поток QueueListener, а код приложения
+    # (в том числе event loop) только кладёт запись в очередь
     logger = logging.getLogger("backend")
     logger.setLevel(logging.INFO)
 
-    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
-
-    file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(build_formatter())
     console_handler.addFilter(ErrorFilter())
-    logger.addHandler(console_handler)
+
+    queue_handler = LogQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(SamplingFilter(settings.LOG_INFO_SAMPLE_RATE))
+    queue_handler.addFilter(RequestIdFilter())
+    logger.addHandler(queue_handler)
+
+    def start_listener():
+        listener = logging.handlers.QueueListener(
+            queue_handler.queue,
+            build_output_handler(),
+            console_handler,
+            respect_handler_level=True,
+        )
+        listener.start()
+        # Записи, оставшиеся в очереди, дописываются при завершении процесса
+        atexit.register(listener.stop)
+
+    def restart_after_fork():
+        # Поток слушателя не переживает fork (gRPC из lifespan и супервизора):
+        # дочерний процесс получает свою очередь и свой поток, а файл лога
+        # пишет через сокет родителя, если тот вызвал start_log_server
+        queue_handler.queue = queue.SimpleQueue()
+        start_listener()
+
+    start_listener()
+    os.register_at_fork(after_in_child=restart_after_fork)
 
     return logger
 
@@ -1,35 +1,57 @@
 from fastapi import FastAPI, HTTPException, Depends, Query, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import (
+    JSONResponse,
+    ORJSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.openapi.utils import get_openapi
 from contextlib import asynccontextmanager
 from jose import jwt
 from prometheus_fastapi_instrumentator import Instrumentator, metrics
-from prometheus_client import start_http_server
+from prometheus_client import multiprocess, start_http_server
+import csv
+import io
 import uuid
 import json
+import orjson
 import multiprocessing
+import os
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, Union
 from app.config import settings
 from app.database import (
     init_db,
-    has_active_reception,
-    get_active_reception_id,
-    get_last_product_id,
-    get_pvz_list,
-    get_db,
+    get_pvz_list_async,
+    decode_pvz_cursor,
+    get_pvz_page_async,
+    get_pvz_json_async,
+    get_async_db,
+    get_async_read_db_factory,
+    iter_export_rows_async,
+    iter_pvz_tree_async,
+    EXPORT_COLUMNS,
+    open_async_pool,
+    close_async_pool,
+    close_replica_pool,
 )
 from app.security import *
 from app.schemas import *
 from app.metrics import *
-from app.logger import logger
+from app import operations
+from app.password_hasher import password_hasher, HasherBusy
+from app.operations import OperationError, ALLOWED_CITIES
+from app.logger import logger, new_request_id, request_id_var, start_log_server
+from app.response_cache import (
+    cached_pvz_list,
+    etag_matches,
+    invalidate_pvz_list,
+    not_modified,
+)
+from app.query_timing import execute
 from app.grpc.grpc_server import serve as run_grpc_server
 
-import psycopg2.extras
-
-psycopg2.extras.register_uuid()
-
 
 security = HTTPBearer()
 
@@ -48,38 +70,58 @@ def save_openapi_spec():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
-    save_openapi_spec()
-    start_http_server(9000)
-    logger.info("Сервер с метриками на порту 9000 запущен")
-    grpc_process = multiprocessing.Process(target=run_grpc_server)
-    grpc_process.start()
+    # Под супервизором (python -m app.server) миграции, openapi.json, сервер
+    # метрик и gRPC запускаются им один раз, а не в каждом воркере
+    if not settings.APP_SUPERVISED:
+        init_db()
+        save_openapi_spec()
+    await open_async_pool()
+    if not settings.APP_SUPERVISED:
+        start_http_server(settings.METRICS_PORT)
+        logger.info(f"Сервер с метриками на порту {settings.METRICS_PORT} запущен")
+    # Обычно gRPC сервер запускается отдельно: python -m app.grpc.grpc_server
+    grpc_process = None
+    if settings.GRPC_RUN_IN_APP and not settings.APP_SUPERVISED:
+        start_log_server()
+        grpc_process = multiprocessing.Process(target=run_grpc_server)
+        grpc_process.start()
     logger.info("Приложение запущено")
     yield
+    if grpc_process:
+        grpc_process.terminate()
+        grpc_process.join()
+    password_hasher.shutdown()
+    await close_async_pool()
+    await close_replica_pool()
+    if settings.APP_SUPERVISED:
+        # Значения gauge остановленного воркера больше не учитываются
+        multiprocess.mark_process_dead(os.getpid())
     logger.info("Приложение остановлено")
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-instrumentator = Instrumentator()
-instrumentator.add(
-    metrics.requests(
-        should_include_handler=False,
-        should_include_method=False,
-        should_include_status=False,
-        metric_doc="Total number of requests",
-    )
-)
-instrumentator.add(
-    metrics.latency(
-        should_include_handler=False,
-        should_include_method=False,
-        should_include_status=False,
-    )
+# Метрики HTTP по шаблону пути, методу и точному коду ответа. Запросы к
+# несуществующим путям не создают новых меток (should_ignore_untemplated)
+instrumentator = Instrumentator(
+    should_group_status_codes=False,
+    should_ignore_untemplated=True,
+    should_instrument_requests_inprogress=True,
+    inprogress_labels=True,
 )
+instrumentator.add(metrics.requests(metric_doc="Total number of requests"))
+instrumentator.add(metrics.latency(buckets=settings.HTTP_LATENCY_BUCKETS))
+instrumentator.add(http_sizes)
 instrumentator.instrument(app)
 
 
+def model_response(content, status_code: int = 200) -> ORJSONResponse:
+    # Словари операций уже совпадают с response_model по полям и их порядку,
+    # поэтому ответ сериализуется orjson сразу, без повторной валидации и
+    # jsonable_encoder в FastAPI. response_model остаётся для документации
+    return ORJSONResponse(content, status_code=status_code)
+
+
 @app.middleware("http")
 async def log_errors(request: Request, call_next):
     try:
@@ -92,6 +134,27 @@ async def log_errors(request: Request, call_next):
         raise
 
 
+def resolve_request_id(value: str | None) -> str:
+    # Свой X-Request-ID клиента принимается, если он не слишком длинный и
+    # не содержит управляющих символов, иначе генерируется новый
+    if value and len(value) <= 128 and value.isprintable():
+        return value
+    return new_request_id()
+
+
+# Добавлен после log_errors, поэтому выполняется раньше и id виден в его логах
+@app.middleware("http")
+async def request_id(request: Request, call_next):
+    value = resolve_request_id(request.headers.get("x-request-id"))
+    token = request_id_var.set(value)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = value
+    return response
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     if exc.status_code >= 400 and exc.status_code < 500:
@@ -106,16 +169,15 @@ async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=exc.headers,
     )
 
 
-def get_current_role(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_role(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
     try:
-        token = credentials.credentials
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        return payload["role"]
+        return decode_role(credentials.credentials)
     except:
         raise HTTPException(status_code=403, detail="Доступ запрещён")
 
@@ -128,7 +190,7 @@ def get_current_role(credentials: HTTPAuthorizationCredentials = Depends(securit
     },
     response_model=Token,
 )
-def dummy_login(request: DummyLoginRequest):
+async def dummy_login(request: DummyLoginRequest):
     if request.role not in ["employee", "moderator"]:
         raise HTTPException(
             status_code=400,
@@ -136,7 +198,7 @@ def dummy_login(request: DummyLoginRequest):
         )
 
     token = create_access_token(role=request.role)
-    return {"token": token}
+    return model_response({"token": token})
 
 
 @app.post(
@@ -149,19 +211,18 @@ def dummy_login(request: DummyLoginRequest):
         403: {"model": Error, "description": "Доступ запрещен"},
     },
 )
-def create_pvz(
+async def create_pvz(
     pvz_data: PVZCreate,
-    connection=Depends(get_db),
+    connection=Depends(get_async_db),
     role: str = Depends(get_current_role),
 ):
     if role != "moderator":
         raise HTTPException(status_code=403, detail="Только для модераторов")
 
-    allowed_cities = ["Москва", "Санкт-Петербург", "Казань"]
-    if pvz_data.city not in allowed_cities:
+    if pvz_data.city not in ALLOWED_CITIES:
         raise HTTPException(
             status_code=400,
-            detail=f"Недопустимый город. Допустимые значения: {', '.join(allowed_cities)}",
+            detail=f"Недопустимый город. Допустимые значения: {', '.join(ALLOWED_CITIES)}",
         )
 
     conn = None
@@ -172,7 +233,9 @@ def create_pvz(
         pvz_id = uuid.uuid4()
         registration_date = datetime.now(timezone.utc)
 
-        cur.execute(
+        await execute(
+            cur,
+            "create_pvz",
             """
             INSERT INTO pvz (id, registration_date, city)
             VALUES (%s, %s, %s)
@@ -180,15 +243,19 @@ def create_pvz(
             """,
             (pvz_id, registration_date, pvz_data.city),
         )
-        result = cur.fetchone()
-        conn.commit()
+        result = await cur.fetchone()
+        await conn.commit()
 
+        invalidate_pvz_list()
         PVZ_CREATED.inc()
-        return {"id": result[0], "registration_date": result[1], "city": result[2]}
+        return model_response(
+            {"id": result[0], "registration_date": result[1], "city": result[2]},
+            status.HTTP_201_CREATED,
+        )
 
     except Exception as e:
         if conn:
-            conn.rollback()
+            await conn.rollback()
         raise HTTPException(status_code=500)
 
 
@@ -205,53 +272,23 @@ def create_pvz(
         403: {"model": Error, "description": "Доступ запрещен"},
     },
 )
-def create_reception(
+async def create_reception(
     reception_data: ReceptionCreate,
-    connection=Depends(get_db),
+    connection=Depends(get_async_db),
     role: str = Depends(get_current_role),
 ):
-    if role != "employee":
-        raise HTTPException(status_code=403, detail="Только для сотрудников ПВЗ")
-
-    conn = None
     try:
-        if has_active_reception(connection, reception_data.pvz_id):
-            raise HTTPException(
-                status_code=400,
-                detail="В этом ПВЗ уже есть активная приёмка или неверный запрос.",
-            )
-
-        conn = connection
-        cur = conn.cursor()
-
-        reception_id = str(uuid.uuid4())
-        date_time = datetime.now(timezone.utc)
-
-        cur.execute(
-            """
-            INSERT INTO receptions (id, date_time, pvz_id, status)
-            VALUES (%s, %s, %s, 'in_progress')
-            RETURNING id, date_time, pvz_id, status
-            """,
-            (reception_id, date_time, reception_data.pvz_id),
+        result = await operations.create_reception(
+            connection, role, reception_data.pvz_id
         )
-        result = cur.fetchone()
-        conn.commit()
-
-        RECEPTIONS_CREATED.inc()
-        return {
-            "id": result[0],
-            "date_time": result[1],
-            "pvz_id": result[2],
-            "status": result[3],
-        }
+        invalidate_pvz_list()
+        return model_response(result, status.HTTP_201_CREATED)
 
-    except HTTPException:
-        raise
+    except OperationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await connection.rollback()
         raise HTTPException(status_code=500)
 
 
@@ -268,61 +305,60 @@ def create_reception(
         403: {"model": Error, "description": "Доступ запрещен"},
     },
 )
-def add_product(
+async def add_product(
     product_data: ProductCreate,
-    connection=Depends(get_db),
+    connection=Depends(get_async_db),
     role: str = Depends(get_current_role),
 ):
-    if role != "employee":
-        raise HTTPException(status_code=403, detail="Только для сотрудников ПВЗ")
-
-    allowed_types = ["электроника", "одежда", "обувь"]
-    if product_data.type not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Недопустимый тип продукта. Допустимые значения: {', '.join(allowed_types)}",
+    try:
+        result = await operations.add_product(
+            connection, role, product_data.pvz_id, product_data.type
         )
+        invalidate_pvz_list()
+        return model_response(result, status.HTTP_201_CREATED)
 
-    conn = None
-    try:
-        reception_id = get_active_reception_id(connection, product_data.pvz_id)
-        if not reception_id:
-            raise HTTPException(
-                status_code=400,
-                detail="В этом ПВЗ нет активной приёмки или неверный запрос.",
-            )
+    except OperationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        conn = connection
-        cur = conn.cursor()
+    except Exception as e:
+        await connection.rollback()
+        raise HTTPException(status_code=500)
 
-        product_id = str(uuid.uuid4())
-        date_time = datetime.now(timezone.utc)
 
-        cur.execute(
-            """
-            INSERT INTO products (id, date_time, type, reception_id)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id, date_time, type, reception_id
-            """,
-            (product_id, date_time, product_data.type, reception_id),
+@app.post(
+    "/products/batch",
+    response_model=List[Product],
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {"description": "Товары добавлены"},
+        400: {
+            "model": Error,
+            "description": "Неверный запрос или нет активной приемки",
+        },
+        403: {"model": Error, "description": "Доступ запрещен"},
+    },
+)
+async def add_products_batch(
+    batch_data: ProductBatchCreate,
+    connection=Depends(get_async_db),
+    role: str = Depends(get_current_role),
+):
+    # Приёмка ищется один раз, все товары вставляются одним запросом в одной транзакции
+    try:
+        result = await operations.add_products(
+            connection,
+            role,
+            batch_data.pvz_id,
+            [item.type for item in batch_data.items],
         )
-        result = cur.fetchone()
-        conn.commit()
-
-        PRODUCTS_ADDED.inc()
-        return {
-            "id": result[0],
-            "date_time": result[1],
-            "type": result[2],
-            "reception_id": result[3],
-        }
+        invalidate_pvz_list()
+        return model_response(result, status.HTTP_201_CREATED)
 
-    except HTTPException:
-        raise
+    except OperationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await connection.rollback()
         raise HTTPException(status_code=500)
 
 
@@ -338,37 +374,21 @@ def add_product(
         403: {"model": Error, "description": "Доступ запрещен"},
     },
 )
-def delete_last_product(
+async def delete_last_product(
     pvz_id: UUID,
-    connection=Depends(get_db),
+    connection=Depends(get_async_db),
     role: str = Depends(get_current_role),
 ):
-    if role != "employee":
-        raise HTTPException(status_code=403, detail="Только для сотрудников ПВЗ")
-
-    conn = None
     try:
-        product_id = get_last_product_id(connection, pvz_id)
-        if not product_id:
-            raise HTTPException(
-                status_code=400,
-                detail="Неверный запрос, нет активной приемки или нет товаров для удаления",
-            )
-
-        conn = connection
-        cur = conn.cursor()
-        cur.execute("DELETE FROM products WHERE id = %s RETURNING id", (product_id,))
-        deleted = cur.fetchone()
-        conn.commit()
+        product_id = await operations.delete_last_product(connection, role, pvz_id)
+        invalidate_pvz_list()
+        return model_response({"message": f"Товар {product_id} удалён"})
 
-        return {"message": f"Товар {deleted[0]} удалён"}
-
-    except HTTPException:
-        raise
+    except OperationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
     except Exception as e:
-        if conn:
-            conn.rollback()
+        await connection.rollback()
         raise HTTPException(status_code=500)
 
 
@@ -382,66 +402,90 @@ def delete_last_product(
         403: {"model": Error, "description": "Доступ запрещен"},
     },
 )
-def close_last_reception(
+async def close_last_reception(
     pvz_id: UUID,
-    connection=Depends(get_db),
+    connection=Depends(get_async_db),
     role: str = Depends(get_current_role),
 ):
-    if role != "employee":
-        raise HTTPException(status_code=403, detail="Только для сотрудников ПВЗ")
-
-    conn = None
     try:
-        reception_id = get_active_reception_id(connection, pvz_id)
-        if not reception_id:
-            raise HTTPException(
-                status_code=400, detail="Неверный запрос или приемка уже закрыта"
-            )
+        result = await operations.close_last_reception(connection, role, pvz_id)
+        invalidate_pvz_list()
+        return model_response(result)
 
-        conn = connection
-        cur = conn.cursor()
+    except OperationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        cur.execute(
-            """
-            UPDATE receptions
-            SET status = 'close'
-            WHERE id = %s
-            RETURNING id, date_time, pvz_id, status
-            """,
-            (reception_id,),
+    except Exception as e:
+        await connection.rollback()
+        raise HTTPException(status_code=500)
+
+
+async def build_pvz_list_body(
+    connection, start_date, end_date, page, limit, keyset, after, fast_json
+) -> bytes:
+    # Тело ответа GET /pvz в байтах. Словари из app/database.py уже в форме
+    # response_model (даты - строки ISO), поэтому orjson даёт тот же JSON,
+    # что и сериализация FastAPI, без валидации. keyset - передан cursor,
+    # after - он же в разобранном виде
+    if fast_json:
+        items_json, next_cursor = await get_pvz_json_async(
+            connection, start_date, end_date, page, limit, keyset, after
         )
-        result = cur.fetchone()
-        conn.commit()
-
-        return {
-            "id": result[0],
-            "date_time": result[1],
-            "pvz_id": result[2],
-            "status": result[3],
-        }
+        # PostgreSQL пишет json с пробелами вокруг ":" и ",". Повторная
+        # сериализация orjson (без словарей pydantic и дат) даёт те же байты,
+        # что и обычный путь, а значит и тот же ETag
+        content = orjson.dumps(orjson.loads(items_json))
+        if keyset:
+            content = (
+                b'{"items":'
+                + content
+                + b',"next_cursor":'
+                + orjson.dumps(next_cursor)
+                + b"}"
+            )
+        return content
 
-    except HTTPException:
-        raise
+    if keyset:
+        items, next_cursor = await get_pvz_page_async(
+            connection, start_date, end_date, limit, after
+        )
+        return orjson.dumps({"items": items, "next_cursor": next_cursor})
 
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise HTTPException(status_code=500)
+    pvz_data = await get_pvz_list_async(connection, start_date, end_date, page, limit)
+    return orjson.dumps(pvz_data)
 
 
 @app.get(
     "/pvz",
-    response_model=List[PVZNested],
+    response_model=Union[List[PVZNested], PVZPage],
     status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Список ПВЗ. Если передан cursor, список возвращается "
+            "в поле items вместе с next_cursor"
+        },
+        304: {"description": "Страница не изменилась (If-None-Match)"},
+        400: {"model": Error, "description": "Некорректный курсор"},
+    },
 )
-def list_pvz(
-    connection=Depends(get_db),
+async def list_pvz(
+    request: Request,
+    db_factory=Depends(get_async_read_db_factory),
     start_date: Optional[datetime] = Query(
         None, description="Начальная дата диапазона"
     ),
     end_date: Optional[datetime] = Query(None, description="Конечная дата диапазона"),
     page: int = Query(1, ge=1, description="Номер страницы"),
     limit: int = Query(10, ge=1, le=30, description="Количество элементов на странице"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Курсор страницы из next_cursor. Пустое значение - первая страница",
+    ),
+    fast_json: Optional[bool] = Query(
+        None,
+        description="Собрать JSON ответа в БД без обработки в Python. "
+        "По умолчанию берётся из настройки PVZ_LIST_SQL_JSON",
+    ),
     role: str = Depends(get_current_role),
 ):
 
@@ -449,12 +493,127 @@ def list_pvz(
         raise HTTPException(
             status_code=403, detail="Только для модераторов и сотрудников"
         )
+    if fast_json is None:
+        fast_json = settings.PVZ_LIST_SQL_JSON
+
+    # Курсор проверяется до обращения к кэшу и БД
     try:
-        pvz_data = get_pvz_list(connection, start_date, end_date, page, limit)
-        return pvz_data
+        after = decode_pvz_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    keyset = cursor is not None
+
+    # Соединение из пула берётся только при промахе кэша
+    async def build_body():
+        async with db_factory() as connection:
+            return await build_pvz_list_body(
+                connection, start_date, end_date, page, limit, keyset, after, fast_json
+            )
+
+    try:
+        entry = await cached_pvz_list(
+            (start_date, end_date, page, limit, cursor, fast_json), build_body
+        )
     except Exception as e:
         raise HTTPException(status_code=500)
 
+    headers = {"ETag": entry.etag}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        not_modified(entry)
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+@app.get(
+    "/pvz/export",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Выгрузка ПВЗ с приёмками и товарами. NDJSON - один ПВЗ "
+            "в формате элемента GET /pvz на строку, CSV - строки ПВЗ x приёмка x товар",
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+        },
+        400: {"model": Error, "description": "Неверный запрос"},
+        403: {"model": Error, "description": "Доступ запрещен"},
+    },
+)
+async def export_pvz(
+    db_factory=Depends(get_async_read_db_factory),
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    start_date: Optional[datetime] = Query(
+        None, description="Начальная дата диапазона"
+    ),
+    end_date: Optional[datetime] = Query(None, description="Конечная дата диапазона"),
+    city: Optional[str] = Query(None, description="Город ПВЗ"),
+    role: str = Depends(get_current_role),
+):
+    if role != "moderator" and role != "employee":
+        raise HTTPException(
+            status_code=403, detail="Только для модераторов и сотрудников"
+        )
+
+    if format not in ["ndjson", "csv"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Недопустимый формат. Допустимые значения: ndjson, csv",
+        )
+
+    if city is not None and city not in ALLOWED_CITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Недопустимый город. Допустимые значения: {', '.join(ALLOWED_CITIES)}",
+        )
+
+    batch_size = settings.EXPORT_BATCH_SIZE
+
+    async def ndjson_lines():
+        async with db_factory() as conn:
+            rows = iter_export_rows_async(conn, start_date, end_date, city, batch_size)
+            async for item in iter_pvz_tree_async(rows):
+                yield orjson.dumps(item) + b"\n"
+
+    async def csv_chunks():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        async with db_factory() as conn:
+            rows = iter_export_rows_async(conn, start_date, end_date, city, batch_size)
+            count = 0
+            async for row in rows:
+                writer.writerow(
+                    [
+                        value.isoformat() if isinstance(value, datetime) else value
+                        for value in row
+                    ]
+                )
+                count += 1
+                if count % batch_size == 0:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="pvz_export.csv"'},
+        )
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="pvz_export.ndjson"'},
+    )
+
+
+def hasher_busy_error() -> HTTPException:
+    # Всплеск логинов отсекается сразу, а не копится в очереди
+    return HTTPException(
+        status_code=503,
+        detail="Сервис перегружен, повторите запрос позже",
+        headers={"Retry-After": str(settings.BCRYPT_RETRY_AFTER_SECONDS)},
+    )
+
 
 @app.post(
     "/register",
@@ -463,17 +622,23 @@ def list_pvz(
     responses={
         201: {"description": "Пользователь создан"},
         400: {"model": Error, "description": "Неверный запрос"},
+        503: {"model": Error, "description": "Очередь хэширования паролей заполнена"},
     },
 )
-def register_user(user_data: UserRegister, connection=Depends(get_db)):
+async def register_user(user_data: UserRegister, connection=Depends(get_async_db)):
     conn = None
     try:
         logger.info(f"Register attempt: email={user_data.email}, role={user_data.role}")
         conn = connection
         cur = conn.cursor()
 
-        cur.execute("SELECT id FROM users WHERE email = %s", (user_data.email,))
-        if cur.fetchone():
+        await execute(
+            cur,
+            "user_exists",
+            "SELECT id FROM users WHERE email = %s",
+            (user_data.email,),
+        )
+        if await cur.fetchone():
             raise HTTPException(status_code=400, detail="Email уже зарегистрирован")
 
         if user_data.role not in ["employee", "moderator"]:
@@ -482,10 +647,12 @@ def register_user(user_data: UserRegister, connection=Depends(get_db)):
                 detail="Недопустимая роль. Допустимые значения: 'employee', 'moderator'",
             )
 
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
 
         user_id = str(uuid.uuid4())
-        cur.execute(
+        await execute(
+            cur,
+            "create_user",
             """
             INSERT INTO users (id, email, password_hash, role)
             VALUES (%s, %s, %s, %s)
@@ -493,18 +660,23 @@ def register_user(user_data: UserRegister, connection=Depends(get_db)):
             """,
             (user_id, user_data.email, hashed_password, user_data.role),
         )
-        result = cur.fetchone()
-        conn.commit()
+        result = await cur.fetchone()
+        await conn.commit()
 
         logger.info(f"Пользователь зарегистрировался: id={result[0]}")
-        return {"id": result[0], "email": result[1], "role": result[2]}
+        return model_response(
+            {"id": result[0], "email": result[1], "role": result[2]},
+            status.HTTP_201_CREATED,
+        )
 
     except HTTPException as e:
         logger.warning(f"Неудачная регистрация: {e.detail}")
         raise
+    except HasherBusy:
+        raise hasher_busy_error()
     except Exception as e:
         if conn:
-            conn.rollback()
+            await conn.rollback()
         logger.error(f"Ошибка при регистрации: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500)
 
@@ -516,22 +688,25 @@ def register_user(user_data: UserRegister, connection=Depends(get_db)):
     responses={
         200: {"description": "Успешная авторизация"},
         401: {"model": Error, "description": "Неверные учетные данные"},
+        503: {"model": Error, "description": "Очередь хэширования паролей заполнена"},
     },
 )
-def login_user(user_data: UserLogin, connection=Depends(get_db)):
+async def login_user(user_data: UserLogin, connection=Depends(get_async_db)):
     conn = None
     try:
         logger.info(f"Login attempt: email={user_data.email}")
         conn = connection
         cur = conn.cursor()
 
-        cur.execute(
+        await execute(
+            cur,
+            "user_by_email",
             "SELECT id, email, password_hash, role FROM users WHERE email = %s",
             (user_data.email,),
         )
-        user = cur.fetchone()
+        user = await cur.fetchone()
 
-        if not user or not verify_password(user_data.password, user[2]):
+        if not user or not await password_hasher.verify(user_data.password, user[2]):
             raise HTTPException(status_code=401, detail="Неверный email или пароль")
 
         token_data = {
@@ -544,11 +719,13 @@ def login_user(user_data: UserLogin, connection=Depends(get_db)):
         )
 
         logger.info(f"Пользователь залогинился: email={user_data.email}")
-        return {"token": token}
+        return model_response({"token": token})
 
     except HTTPException as e:
         logger.warning(f"Неудачный логин: {e.detail}")
         raise
+    except HasherBusy:
+        raise hasher_busy_error()
     except Exception as e:
         logger.error(f"Ошибка при логине: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500)
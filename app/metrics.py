@@ -1,6 +1,123 @@
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
+from app.config import settings
 
 
 PVZ_CREATED = Counter("pvz_created_total", "Total PVZ Created")
 RECEPTIONS_CREATED = Counter("receptions_created_total", "Total Receptions Created")
 PRODUCTS_ADDED = Counter("products_added_total", "Total Products Added")
+
+# multiprocess_mode: при нескольких воркерах значения gauge суммируются по
+# живым процессам. Без PROMETHEUS_MULTIPROC_DIR параметр ни на что не влияет
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "DB connections checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_connections_idle",
+    "Idle DB connections in the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_requests_waiting",
+    "Requests waiting for a DB connection",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+# Запросы к БД обычно укладываются в миллисекунды, стандартные корзины
+# prometheus_client (от 5 мс) для них слишком грубые
+DB_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL query execution time",
+    ["query"],
+    buckets=DB_LATENCY_BUCKETS,
+)
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "SQL queries slower than DB_SLOW_QUERY_SECONDS", ["query"]
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the pool",
+    ["pool"],
+    buckets=DB_LATENCY_BUCKETS,
+)
+
+# Чтение через реплику: куда ушла сессия чтения (replica/primary) и почему
+# реплика не использовалась (unavailable/lag)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag of the read replica at the last check",
+    multiprocess_mode="max",
+)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read-only DB sessions by target", ["target"]
+)
+DB_REPLICA_FALLBACKS = Counter(
+    "db_replica_fallbacks_total",
+    "Read-only sessions sent to the primary instead of the replica",
+    ["reason"],
+)
+
+JWT_CACHE_HITS = Counter("jwt_cache_hits_total", "JWT found in the verified cache")
+JWT_CACHE_MISSES = Counter("jwt_cache_misses_total", "JWT decoded and verified")
+
+BCRYPT_PENDING = Gauge(
+    "bcrypt_pending",
+    "Password hashes running or queued in the bcrypt pool",
+    multiprocess_mode="livesum",
+)
+BCRYPT_REJECTED = Counter(
+    "bcrypt_rejected_total", "Password hashes rejected because the queue is full"
+)
+
+PVZ_CACHE_HITS = Counter("pvz_list_cache_hits_total", "GET /pvz served from the cache")
+PVZ_CACHE_MISSES = Counter("pvz_list_cache_misses_total", "GET /pvz built from the DB")
+PVZ_CACHE_BYTES_SAVED = Counter(
+    "pvz_list_cache_bytes_saved_total", "GET /pvz body bytes not sent due to 304"
+)
+
+HTTP_REQUEST_SIZE = Histogram(
+    "http_request_size_bytes",
+    "HTTP request body size",
+    ["handler", "method", "status"],
+    buckets=settings.HTTP_SIZE_BUCKETS,
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size",
+    ["handler", "method", "status"],
+    buckets=settings.HTTP_SIZE_BUCKETS,
+)
+
+
+def http_sizes(info):
+    # Для Instrumentator: размеры берутся из Content-Length без чтения тела.
+    # У потоковых ответов (GET /pvz/export) заголовка нет, они не учитываются
+    labels = (info.modified_handler, info.method, info.modified_status)
+    request_size = info.request.headers.get("content-length")
+    if request_size is not None:
+        HTTP_REQUEST_SIZE.labels(*labels).observe(int(request_size))
+    if info.response is not None:
+        response_size = info.response.headers.get("content-length")
+        if response_size is not None:
+            HTTP_RESPONSE_SIZE.labels(*labels).observe(int(response_size))
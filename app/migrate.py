@@ -0,0 +1,177 @@
+import argparse
+import re
+import time
+from pathlib import Path
+
+import psycopg2
+
+from app.config import settings
+from app.logger import logger
+
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATIONS_ENCODING = "CP1251"
+
+# Миграции с этой пометкой в первой строке выполняются вне транзакции,
+# по одному выражению (нужно для CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Выражение с этой пометкой в такой миграции повторяется, пока изменяет
+# строки: большая таблица заполняется пачками, каждая в своей транзакции
+BATCH_MARKER = "-- migrate: batch"
+
+# Произвольный ключ advisory lock: одновременно миграции применяет только один процесс
+MIGRATIONS_LOCK_ID = 4815162342
+MIGRATIONS_LOCK_POLL_SECONDS = 0.5
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class MigrationError(Exception):
+    pass
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> list[tuple[int, str, str]]:
+    migrations = []
+    for path in sorted(directory.iterdir()):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            continue
+        version, name = int(match.group(1)), match.group(2)
+        sql = path.read_text(encoding=MIGRATIONS_ENCODING)
+        migrations.append((version, name, sql))
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("Несколько миграций с одинаковым номером")
+    return migrations
+
+
+def split_batched_statements(sql: str) -> list[tuple[str, bool]]:
+    # Простое разбиение по ";" - подходит для DDL без функций и строк с ";".
+    # Для каждого выражения возвращается, помечено ли оно BATCH_MARKER
+    statements = []
+    for chunk in sql.split(";"):
+        stripped = [line.strip() for line in chunk.splitlines()]
+        lines = [
+            line for line in chunk.splitlines() if not line.strip().startswith("--")
+        ]
+        statement = "\n".join(lines).strip()
+        if statement:
+            statements.append((statement, BATCH_MARKER in stripped))
+    return statements
+
+
+def split_statements(sql: str) -> list[str]:
+    return [statement for statement, _ in split_batched_statements(sql)]
+
+
+def get_applied_versions(connection) -> set[int]:
+    cur = connection.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def apply_migration(connection, version: int, name: str, sql: str):
+    cur = connection.cursor()
+    if sql.lstrip().startswith(NO_TRANSACTION_MARKER):
+        for statement, batched in split_batched_statements(sql):
+            cur.execute(statement)
+            while batched and cur.rowcount > 0:
+                cur.execute(statement)
+    else:
+        cur.execute(sql)
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+        (version, name),
+    )
+
+
+def acquire_migrations_lock(cur):
+    # Блокировка опрашивается, а не ожидается в pg_advisory_lock: ожидающий
+    # запрос держит снапшот, а CREATE INDEX CONCURRENTLY в другом процессе
+    # ждёт завершения всех снапшотов, и получается взаимная блокировка
+    deadline = time.monotonic() + settings.MIGRATIONS_LOCK_TIMEOUT_SECONDS
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+        if cur.fetchone()[0]:
+            return
+        if time.monotonic() >= deadline:
+            raise MigrationError(
+                "Миграции применяет другой процесс, время ожидания истекло"
+            )
+        time.sleep(MIGRATIONS_LOCK_POLL_SECONDS)
+
+
+def apply_pending_migrations(connection, directory: Path) -> list[int]:
+    cur = connection.cursor()
+    applied = []
+    done = get_applied_versions(connection)
+    for version, name, sql in load_migrations(directory):
+        if version in done:
+            continue
+        transactional = not sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+        try:
+            if transactional:
+                cur.execute("BEGIN")
+            apply_migration(connection, version, name, sql)
+            if transactional:
+                cur.execute("COMMIT")
+        except Exception as e:
+            if transactional:
+                cur.execute("ROLLBACK")
+            raise MigrationError(f"Миграция {version}_{name} не применена: {e}")
+        logger.info(f"Применена миграция {version}_{name}")
+        applied.append(version)
+    return applied
+
+
+def run_migrations(connection, directory: Path = MIGRATIONS_DIR) -> list[int]:
+    # Соединение переводится в autocommit: транзакционные миграции
+    # оборачиваются в BEGIN/COMMIT явно, остальные выполняются как есть
+    connection.autocommit = True
+    cur = connection.cursor()
+    try:
+        acquire_migrations_lock(cur)
+        try:
+            return apply_pending_migrations(connection, directory)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+    finally:
+        connection.autocommit = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Применить миграции схемы БД")
+    parser.add_argument(
+        "--list", action="store_true", help="Показать статус миграций и выйти"
+    )
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        dbname=settings.DB_NAME,
+    )
+    try:
+        if args.list:
+            conn.autocommit = True
+            done = get_applied_versions(conn)
+            for version, name, _ in load_migrations():
+                mark = "x" if version in done else " "
+                print(f"[{mark}] {version:04d}_{name}")
+        else:
+            applied = run_migrations(conn)
+            print(f"Применено миграций: {len(applied)}")
+    finally:
+        conn.close()
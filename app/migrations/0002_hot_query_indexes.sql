@@ -0,0 +1,35 @@
+-- migrate: no-transaction
+--   CONCURRENTLY,       .
+--   , PostgreSQL   , 
+--    :       .
+
+--    (has_active_reception, get_active_reception_id).
+--  :        .
+--      create_reception   ,
+--     ,   .
+--      UPDATE   ,  
+--     
+UPDATE receptions r
+SET status = 'close'
+WHERE r.status = 'in_progress'
+  AND EXISTS (
+      SELECT 1
+      FROM receptions newer
+      WHERE newer.pvz_id = r.pvz_id
+        AND newer.status = 'in_progress'
+        AND (newer.date_time, newer.id) > (r.date_time, r.id)
+  );
+
+DROP INDEX CONCURRENTLY IF EXISTS receptions_pvz_id_in_progress_idx;
+CREATE UNIQUE INDEX CONCURRENTLY receptions_pvz_id_in_progress_idx
+    ON receptions (pvz_id) WHERE status = 'in_progress';
+
+--     (get_last_product_id,  )
+DROP INDEX CONCURRENTLY IF EXISTS products_reception_id_date_time_idx;
+CREATE INDEX CONCURRENTLY products_reception_id_date_time_idx
+    ON products (reception_id, date_time);
+
+--      
+DROP INDEX CONCURRENTLY IF EXISTS pvz_registration_date_idx;
+CREATE INDEX CONCURRENTLY pvz_registration_date_idx
+    ON pvz (registration_date);
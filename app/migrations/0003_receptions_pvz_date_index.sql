@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+--   GET /pvz:    (pvz_id = ANY)      ,
+--    EXISTS       
+DROP INDEX CONCURRENTLY IF EXISTS receptions_pvz_id_date_time_idx;
+CREATE INDEX CONCURRENTLY receptions_pvz_id_date_time_idx
+    ON receptions (pvz_id, date_time);
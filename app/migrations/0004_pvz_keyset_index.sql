@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Keyset- GET /pvz  (registration_date, id):  
+--    ,  ,     
+DROP INDEX CONCURRENTLY IF EXISTS pvz_registration_date_id_idx;
+CREATE INDEX CONCURRENTLY pvz_registration_date_id_idx
+    ON pvz (registration_date, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS pvz_registration_date_idx;
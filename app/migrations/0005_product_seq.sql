@@ -0,0 +1,64 @@
+-- migrate: no-transaction
+--     :     
+--  (reception_id, seq)    date_time,   
+--   . receptions.last_seq -   
+-- (   ),       .
+--         :   
+--  ,    ,   
+-- , NOT NULL  ,    
+-- ,    CONCURRENTLY.    , 
+--  
+
+ALTER TABLE receptions ADD COLUMN IF NOT EXISTS last_seq INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS seq INTEGER;
+
+--       :    
+--   ,     
+DROP INDEX CONCURRENTLY IF EXISTS products_reception_id_seq_null_idx;
+CREATE INDEX CONCURRENTLY products_reception_id_seq_null_idx
+    ON products (reception_id) WHERE seq IS NULL;
+
+--  -  1000 .   last_seq , 
+-- ,       ,
+--   .  ,   
+-- migrate: batch
+WITH batch AS (
+    SELECT DISTINCT reception_id
+    FROM products
+    WHERE seq IS NULL
+    LIMIT 1000
+), numbered AS (
+    SELECT p.id, r.last_seq + row_number() OVER (
+        PARTITION BY p.reception_id ORDER BY p.date_time, p.id
+    ) AS seq
+    FROM products p
+    JOIN receptions r ON r.id = p.reception_id
+    WHERE p.reception_id IN (SELECT reception_id FROM batch) AND p.seq IS NULL
+), updated AS (
+    UPDATE products p
+    SET seq = numbered.seq
+    FROM numbered
+    WHERE p.id = numbered.id
+    RETURNING p.reception_id, p.seq
+)
+UPDATE receptions r
+SET last_seq = counts.last_seq
+FROM (
+    SELECT reception_id, max(seq) AS last_seq
+    FROM updated
+    GROUP BY reception_id
+) counts
+WHERE r.id = counts.reception_id;
+
+DROP INDEX CONCURRENTLY IF EXISTS products_reception_id_seq_null_idx;
+
+-- NOT VALID         ,
+-- VALIDATE  ,     
+ALTER TABLE products DROP CONSTRAINT IF EXISTS products_seq_not_null;
+ALTER TABLE products
+    ADD CONSTRAINT products_seq_not_null CHECK (seq IS NOT NULL) NOT VALID;
+ALTER TABLE products VALIDATE CONSTRAINT products_seq_not_null;
+
+DROP INDEX CONCURRENTLY IF EXISTS products_reception_id_seq_idx;
+CREATE UNIQUE INDEX CONCURRENTLY products_reception_id_seq_idx
+    ON products (reception_id, seq);
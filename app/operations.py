@@ -0,0 +1,316 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from app.config import settings
+from app.metrics import RECEPTIONS_CREATED, PRODUCTS_ADDED
+from app.query_timing import execute
+
+# Операции приёмки товаров, общие для REST (app/main.py) и gRPC (app/grpc):
+# проверки роли, входных данных и состояния приёмки выполняются здесь,
+# транспорт только переводит OperationError в свой код ответа.
+#
+# Каждая операция - одно выражение SQL: поиск ПВЗ и активной приёмки идёт
+# в CTE вместе с записью, а первая колонка результата - код результата.
+# Исключение - удаление последнего товара (см. delete_last_product)
+
+
+ALLOWED_CITIES = ["Москва", "Санкт-Петербург", "Казань"]
+ALLOWED_PRODUCT_TYPES = ["электроника", "одежда", "обувь"]
+
+RESULT_OK = "ok"
+RESULT_PVZ_NOT_FOUND = "pvz_not_found"
+RESULT_NO_ACTIVE_RECEPTION = "no_active_reception"
+RESULT_ACTIVE_RECEPTION_EXISTS = "active_reception_exists"
+RESULT_NO_PRODUCTS = "no_products"
+
+
+class OperationError(Exception):
+    status_code = 400
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class AccessDenied(OperationError):
+    status_code = 403
+
+
+class InvalidArgument(OperationError):
+    pass
+
+
+class FailedPrecondition(OperationError):
+    pass
+
+
+# В REST отсутствующий ПВЗ, как и раньше, - 400 с тем же текстом ошибки
+class NotFound(OperationError):
+    pass
+
+
+def check_employee(role: str):
+    if role != "employee":
+        raise AccessDenied("Только для сотрудников ПВЗ")
+
+
+def check_product_type(product_type: str):
+    if product_type not in ALLOWED_PRODUCT_TYPES:
+        raise InvalidArgument(
+            f"Недопустимый тип продукта. Допустимые значения: {', '.join(ALLOWED_PRODUCT_TYPES)}"
+        )
+
+
+def check_result(result: str, detail: str):
+    if result == RESULT_PVZ_NOT_FOUND:
+        raise NotFound(detail)
+    if result != RESULT_OK:
+        raise FailedPrecondition(detail)
+
+
+def active_reception_cte(lock: bool = False) -> str:
+    # Активная приёмка ищется по уникальному частичному индексу
+    # receptions_pvz_id_in_progress_idx.
+    # lock - заблокировать строку приёмки до конца транзакции
+    for_update = " FOR UPDATE" if lock else ""
+    return f"""
+        target_pvz AS (
+            SELECT id FROM pvz WHERE id = %(pvz_id)s
+        ),
+        active_reception AS (
+            SELECT id
+            FROM receptions
+            WHERE pvz_id = %(pvz_id)s AND status = 'in_progress'
+            LIMIT 1{for_update}
+        )
+    """
+
+
+async def create_reception(conn, role: str, pvz_id) -> dict:
+    check_employee(role)
+
+    # Вторая активная приёмка отсекается уникальным частичным индексом
+    # receptions_pvz_id_in_progress_idx, в том числе при гонке двух запросов
+    cur = conn.cursor()
+    await execute(
+        cur,
+        "create_reception",
+        """
+        WITH target_pvz AS (
+            SELECT id FROM pvz WHERE id = %(pvz_id)s
+        ),
+        inserted AS (
+            INSERT INTO receptions (id, date_time, pvz_id, status)
+            SELECT %(id)s, %(date_time)s, id, 'in_progress'
+            FROM target_pvz
+            ON CONFLICT (pvz_id) WHERE status = 'in_progress' DO NOTHING
+            RETURNING id, date_time, pvz_id, status
+        )
+        SELECT
+            CASE
+                WHEN NOT EXISTS (SELECT 1 FROM target_pvz) THEN 'pvz_not_found'
+                WHEN NOT EXISTS (SELECT 1 FROM inserted)
+                    THEN 'active_reception_exists'
+                ELSE 'ok'
+            END,
+            i.id, i.date_time, i.pvz_id, i.status
+        FROM (SELECT 1) AS one
+        LEFT JOIN inserted i ON true
+        """,
+        {
+            "pvz_id": pvz_id,
+            "id": uuid.uuid4(),
+            "date_time": datetime.now(timezone.utc),
+        },
+    )
+    result = await cur.fetchone()
+    check_result(result[0], "В этом ПВЗ уже есть активная приёмка или неверный запрос.")
+    await conn.commit()
+
+    RECEPTIONS_CREATED.inc()
+    return {
+        "id": result[1],
+        "date_time": result[2],
+        "pvz_id": result[3],
+        "status": result[4],
+    }
+
+
+# Товары передаются массивами: одно выражение и для одного товара,
+# и для пакета. UPDATE last_seq блокирует строку приёмки, поэтому
+# параллельные вставки в одну приёмку получают разные номера, а вставка
+# после закрытия приёмки не пройдёт проверку status
+INSERT_PRODUCTS_QUERY = f"""
+    WITH {active_reception_cte()},
+    numbered AS (
+        UPDATE receptions
+        SET last_seq = last_seq + %(count)s
+        WHERE id IN (SELECT id FROM active_reception) AND status = 'in_progress'
+        RETURNING id, last_seq - %(count)s AS first_seq
+    ),
+    inserted AS (
+        INSERT INTO products (id, date_time, type, reception_id, seq)
+        SELECT t.id, t.date_time, t.type, r.id, r.first_seq + t.n
+        FROM numbered r,
+            unnest(%(ids)s::uuid[], %(dates)s::timestamptz[], %(types)s::varchar[])
+                WITH ORDINALITY AS t (id, date_time, type, n)
+        RETURNING id, date_time, type, reception_id, seq
+    )
+    SELECT
+        CASE
+            WHEN NOT EXISTS (SELECT 1 FROM target_pvz) THEN 'pvz_not_found'
+            WHEN NOT EXISTS (SELECT 1 FROM inserted) THEN 'no_active_reception'
+            ELSE 'ok'
+        END,
+        i.id, i.date_time, i.type, i.reception_id
+    FROM (SELECT 1) AS one
+    LEFT JOIN inserted i ON true
+    ORDER BY i.seq
+"""
+
+
+async def insert_products(conn, pvz_id, product_types: list[str]) -> list[dict]:
+    # Время товаров пакета различается на микросекунду, чтобы в GET /pvz
+    # они шли в порядке добавления
+    now = datetime.now(timezone.utc)
+    count = len(product_types)
+    cur = conn.cursor()
+    await execute(
+        cur,
+        "insert_products",
+        INSERT_PRODUCTS_QUERY,
+        {
+            "pvz_id": pvz_id,
+            "ids": [uuid.uuid4() for _ in range(count)],
+            "dates": [now + timedelta(microseconds=i) for i in range(count)],
+            "types": product_types,
+            "count": count,
+        },
+    )
+    rows = await cur.fetchall()
+    check_result(rows[0][0], "В этом ПВЗ нет активной приёмки или неверный запрос.")
+    await conn.commit()
+
+    PRODUCTS_ADDED.inc(count)
+    return [
+        {"id": row[1], "date_time": row[2], "type": row[3], "reception_id": row[4]}
+        for row in rows
+    ]
+
+
+async def add_product(conn, role: str, pvz_id, product_type: str) -> dict:
+    check_employee(role)
+    check_product_type(product_type)
+
+    products = await insert_products(conn, pvz_id, [product_type])
+    return products[0]
+
+
+async def add_products(conn, role: str, pvz_id, product_types: list[str]) -> list:
+    check_employee(role)
+    if not product_types:
+        raise InvalidArgument("Пустой список товаров")
+    if len(product_types) > settings.PRODUCTS_BATCH_MAX_SIZE:
+        raise InvalidArgument(
+            f"Слишком много товаров, максимум {settings.PRODUCTS_BATCH_MAX_SIZE}"
+        )
+    for product_type in product_types:
+        check_product_type(product_type)
+
+    return await insert_products(conn, pvz_id, product_types)
+
+
+LOCK_ACTIVE_RECEPTION_QUERY = f"""
+    WITH {active_reception_cte(lock=True)}
+    SELECT
+        CASE
+            WHEN NOT EXISTS (SELECT 1 FROM target_pvz) THEN 'pvz_not_found'
+            WHEN NOT EXISTS (SELECT 1 FROM active_reception)
+                THEN 'no_active_reception'
+            ELSE 'ok'
+        END,
+        (SELECT id FROM active_reception)
+"""
+
+
+# Последний товар - с номером last_seq: поиск по уникальному индексу
+# (reception_id, seq) без сортировки
+DELETE_LAST_PRODUCT_QUERY = """
+    WITH popped AS (
+        UPDATE receptions
+        SET last_seq = last_seq - 1
+        WHERE id = %(reception_id)s AND last_seq > 0
+        RETURNING id, last_seq + 1 AS seq
+    )
+    DELETE FROM products p
+    USING popped
+    WHERE p.reception_id = popped.id AND p.seq = popped.seq
+    RETURNING p.id
+"""
+
+
+async def delete_last_product(conn, role: str, pvz_id):
+    check_employee(role)
+
+    # Два выражения в одной транзакции: сначала блокируется строка приёмки,
+    # затем товар удаляется по номеру. В одном выражении удаление, дождавшееся
+    # блокировки за параллельной вставкой, видело бы новый last_seq, но не сам
+    # вставленный товар (снимок данных берётся до ожидания) и возвращало бы
+    # no_products. Второе выражение получает новый снимок, а заблокированный
+    # last_seq уже не меняется, так что товары снимаются строго по очереди
+    cur = conn.cursor()
+    await execute(
+        cur, "lock_active_reception", LOCK_ACTIVE_RECEPTION_QUERY, {"pvz_id": pvz_id}
+    )
+    result, reception_id = await cur.fetchone()
+    detail = "Неверный запрос, нет активной приемки или нет товаров для удаления"
+    check_result(result, detail)
+
+    await execute(
+        cur,
+        "delete_last_product",
+        DELETE_LAST_PRODUCT_QUERY,
+        {"reception_id": reception_id},
+    )
+    deleted = await cur.fetchone()
+    if deleted is None:
+        await conn.rollback()
+        check_result(RESULT_NO_PRODUCTS, detail)
+    await conn.commit()
+    return deleted[0]
+
+
+CLOSE_RECEPTION_QUERY = f"""
+    WITH {active_reception_cte()},
+    closed AS (
+        UPDATE receptions
+        SET status = 'close'
+        WHERE id IN (SELECT id FROM active_reception) AND status = 'in_progress'
+        RETURNING id, date_time, pvz_id, status
+    )
+    SELECT
+        CASE
+            WHEN NOT EXISTS (SELECT 1 FROM target_pvz) THEN 'pvz_not_found'
+            WHEN NOT EXISTS (SELECT 1 FROM closed) THEN 'no_active_reception'
+            ELSE 'ok'
+        END,
+        c.id, c.date_time, c.pvz_id, c.status
+    FROM (SELECT 1) AS one
+    LEFT JOIN closed c ON true
+"""
+
+
+async def close_last_reception(conn, role: str, pvz_id) -> dict:
+    check_employee(role)
+
+    cur = conn.cursor()
+    await execute(cur, "close_reception", CLOSE_RECEPTION_QUERY, {"pvz_id": pvz_id})
+    result = await cur.fetchone()
+    check_result(result[0], "Неверный запрос или приемка уже закрыта")
+    await conn.commit()
+
+    return {
+        "id": result[1],
+        "date_time": result[2],
+        "pvz_id": result[3],
+        "status": result[4],
+    }
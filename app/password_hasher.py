@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.config import settings
+from app.logger import logger
+from app.metrics import BCRYPT_PENDING, BCRYPT_REJECTED
+from app.security import hash_password, verify_password
+
+# bcrypt выполняется в отдельном пуле процессов, а не в общем пуле потоков
+# anyio: всплеск /login не отнимает потоки у остальных эндпоинтов и не
+# упирается в GIL. Очередь ограничена - при переполнении запрос сразу
+# получает HasherBusy (503), вместо того чтобы ждать своей очереди
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: воркеры не наследуют event loop, пулы соединений и потоки
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Пул bcrypt запущен, процессов: {self.workers}")
+        return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        # Пул, у которого аварийно завершился процесс, больше не принимает
+        # задачи. Его пересоздаёт только первый заметивший это запрос
+        if self._executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.warning("Процесс пула bcrypt завершился аварийно, пул пересоздан")
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            BCRYPT_REJECTED.inc()
+            raise HasherBusy()
+
+        self.pending += 1
+        BCRYPT_PENDING.set(self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            # Задача, попавшая в сломанный пул, повторяется один раз в новом,
+            # при повторной ошибке запрос получает 503
+            for _ in range(2):
+                executor = self._get_executor()
+                try:
+                    return await loop.run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    self._reset_executor(executor)
+            raise HasherBusy()
+        finally:
+            self.pending -= 1
+            BCRYPT_PENDING.set(self.pending)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.BCRYPT_WORKERS, max_pending=settings.BCRYPT_MAX_PENDING
+)
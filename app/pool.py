@@ -0,0 +1,76 @@
+import time
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool
+
+from app.metrics import DB_POOL_IN_USE, DB_POOL_IDLE, DB_POOL_WAITING, DB_POOL_WAIT
+
+
+def create_async_pool(
+    min_size: int,
+    max_size: int,
+    timeout: float,
+    recycle_seconds: float,
+    check_idle_seconds: float,
+    name: str = "primary_async",
+    conninfo: str = "",
+    **connect_kwargs,
+) -> AsyncConnectionPool:
+    # Асинхронный пул на psycopg 3: max_lifetime - возраст соединения
+    # (recycle_seconds), check - пинг соединений, простаивавших дольше
+    # check_idle_seconds. При возврате незавершённая транзакция откатывается.
+    # Соединения выдаются через async_connection, который отмечает время возврата
+
+    async def check(conn):
+        if conn.closed or conn.broken:
+            raise psycopg.OperationalError("Соединение закрыто")
+        # Только что созданные соединения ещё не возвращались в пул и не проверяются
+        returned_at = getattr(conn, "_returned_at", None)
+        if returned_at and time.monotonic() - returned_at >= check_idle_seconds:
+            await AsyncConnectionPool.check_connection(conn)
+
+    pool = AsyncConnectionPool(
+        conninfo=conninfo,
+        kwargs=connect_kwargs,
+        min_size=min_size,
+        max_size=max_size,
+        timeout=timeout,
+        max_lifetime=recycle_seconds if recycle_seconds > 0 else 3600 * 24 * 365,
+        check=check,
+        name=name,
+        open=False,
+    )
+    pool.in_use = 0
+    return pool
+
+
+def _update_async_pool_metrics(pool: AsyncConnectionPool):
+    stats = pool.get_stats()
+    DB_POOL_IN_USE.labels(pool=pool.name).set(pool.in_use)
+    DB_POOL_IDLE.labels(pool=pool.name).set(stats.get("pool_available", 0))
+    DB_POOL_WAITING.labels(pool=pool.name).set(stats.get("requests_waiting", 0))
+
+
+@asynccontextmanager
+async def async_connection(pool: AsyncConnectionPool):
+    start = time.monotonic()
+    try:
+        conn = await pool.getconn()
+    finally:
+        DB_POOL_WAIT.labels(pool=pool.name).observe(time.monotonic() - start)
+    pool.in_use += 1
+    _update_async_pool_metrics(pool)
+    try:
+        yield conn
+    finally:
+        try:
+            if conn.info.transaction_status != TransactionStatus.IDLE:
+                await conn.rollback()
+        except Exception:
+            pass
+        conn._returned_at = time.monotonic()
+        pool.in_use -= 1
+        await pool.putconn(conn)
+        _update_async_pool_metrics(pool)
@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+from app.config import settings
+from app.logger import logger
+from app.metrics import DB_QUERY_DURATION, DB_SLOW_QUERIES
+
+# Замер запросов к БД: каждый запрос выполняется под постоянным именем
+# (метка query гистограммы db_query_duration_seconds), медленные запросы
+# пишутся в лог. Ожидание соединения из пула сюда не входит - оно
+# измеряется отдельно в app/pool.py (db_pool_wait_seconds)
+
+
+def redact_params(params) -> str:
+    # В лог попадают только типы параметров: значения могут содержать
+    # email, хэши паролей и другие персональные данные
+    if params is None:
+        return "-"
+    if isinstance(params, dict):
+        return (
+            "{"
+            + ", ".join(f"{key}: {_param_type(value)}" for key, value in params.items())
+            + "}"
+        )
+    return "(" + ", ".join(_param_type(value) for value in params) + ")"
+
+
+def _param_type(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+@contextmanager
+def timed_query(name: str, params=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        DB_QUERY_DURATION.labels(query=name).observe(elapsed)
+        threshold = settings.DB_SLOW_QUERY_SECONDS
+        if threshold > 0 and elapsed >= threshold:
+            DB_SLOW_QUERIES.labels(query=name).inc()
+            logger.warning(
+                f"Медленный запрос {name}: {elapsed * 1000:.1f} мс, "
+                f"параметры: {redact_params(params)}"
+            )
+
+
+async def execute(cur, name: str, query, params=None):
+    with timed_query(name, params):
+        await cur.execute(query, params)
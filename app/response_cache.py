@@ -0,0 +1,94 @@
+import hashlib
+import time
+from collections import OrderedDict
+from app.config import settings
+from app.metrics import PVZ_CACHE_HITS, PVZ_CACHE_MISSES, PVZ_CACHE_BYTES_SAVED
+
+# Кэш готовых ответов GET /pvz в памяти процесса: ключ - параметры запроса,
+# значение - тело ответа и его ETag. Запись через REST в этом процессе
+# сбрасывает весь кэш (любая запись может изменить любую страницу), изменения
+# из других воркеров и gRPC становятся видны не позже чем через ttl секунд
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, expires_at: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        # Увеличивается при каждом сбросе: ответ, собранный до записи,
+        # не должен попасть в кэш после неё
+        self.generation = 0
+        self._items = OrderedDict()
+
+    def get(self, key) -> CachedResponse | None:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return entry
+
+    def set(self, key, body: bytes, generation: int) -> CachedResponse:
+        entry = CachedResponse(body, time.monotonic() + self.ttl)
+        if self.max_size <= 0 or generation != self.generation:
+            return entry
+        self._items[key] = entry
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return entry
+
+    def invalidate(self):
+        self.generation += 1
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+pvz_list_cache = ResponseCache(
+    settings.PVZ_LIST_CACHE_SIZE, settings.PVZ_LIST_CACHE_TTL_SECONDS
+)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match сравнивается слабым сравнением (RFC 9110): W/ не учитывается
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for value in if_none_match.split(","):
+        value = value.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+async def cached_pvz_list(key, build_body) -> CachedResponse:
+    # build_body() - корутина, возвращающая тело ответа в байтах
+    entry = pvz_list_cache.get(key)
+    if entry is not None:
+        PVZ_CACHE_HITS.inc()
+        return entry
+    PVZ_CACHE_MISSES.inc()
+    generation = pvz_list_cache.generation
+    body = await build_body()
+    return pvz_list_cache.set(key, body, generation)
+
+
+def not_modified(entry: CachedResponse):
+    PVZ_CACHE_BYTES_SAVED.inc(len(entry.body))
+
+
+def invalidate_pvz_list():
+    pvz_list_cache.invalidate()
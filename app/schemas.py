@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, SkipValidation
 from uuid import UUID
 from datetime import datetime
-from typing import Literal, List
+from typing import Literal, List, Optional
 
 
 class DummyLoginRequest(BaseModel):
@@ -59,6 +59,15 @@ class ProductCreate(BaseModel):
     pvz_id: UUID
 
 
+class ProductBatchItem(BaseModel):
+    type: SkipValidation[Literal["электроника", "одежда", "обувь"]]
+
+
+class ProductBatchCreate(BaseModel):
+    pvz_id: UUID
+    items: List[ProductBatchItem]
+
+
 class Product(BaseModel):
     id: UUID
     date_time: datetime
@@ -77,3 +86,8 @@ class ReceptionNested(BaseModel):
 class PVZNested(BaseModel):
     pvz: PVZ
     receptions: List[ReceptionNested]
+
+
+class PVZPage(BaseModel):
+    items: List[PVZNested]
+    next_cursor: Optional[str]
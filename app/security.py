@@ -1,8 +1,13 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from typing import Union
 import bcrypt
+import hashlib
+import threading
+import time
 from app.config import settings
+from app.metrics import JWT_CACHE_HITS, JWT_CACHE_MISSES
 
 
 def create_access_token(role: str) -> str:
@@ -20,7 +25,7 @@ def hash_password(password: Union[str, bytes]) -> str:
     if isinstance(password, str):
         password = password.encode("utf-8")
 
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password, salt)
     return hashed.decode("utf-8")
 
@@ -35,3 +40,60 @@ def verify_password(
         hashed_password = hashed_password.encode("utf-8")
 
     return bcrypt.checkpw(plain_password, hashed_password)
+
+
+class VerifiedTokenCache:
+    # LRU проверенных токенов: sha256 токена -> (роль, exp).
+    # Запись живёт до exp самого токена, сам токен в памяти не хранится
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            role, expires_at = item
+            if expires_at <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return role
+
+    def set(self, key: bytes, role: str, expires_at: float):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (role, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+verified_tokens = VerifiedTokenCache(settings.JWT_CACHE_SIZE)
+
+
+def decode_role(token: str) -> str:
+    # Роль из JWT; при неверной подписи, истёкшем токене или без роли - исключение.
+    # Токены без exp не кэшируются: их пришлось бы хранить бессрочно
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    role = verified_tokens.get(key)
+    if role is not None:
+        JWT_CACHE_HITS.inc()
+        return role
+
+    JWT_CACHE_MISSES.inc()
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    role = payload["role"]
+    if isinstance(payload.get("exp"), (int, float)):
+        verified_tokens.set(key, role, payload["exp"])
+    return role
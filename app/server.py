@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+import shutil
+from app.config import settings
+
+# Запуск приложения в несколько воркеров uvicorn: python -m app.server
+#
+# Супервизор один раз применяет миграции, обновляет openapi.json, запускает
+# сервер метрик и (при GRPC_RUN_IN_APP) gRPC сервер, а воркеры uvicorn только
+# обслуживают HTTP. Метрики воркеров пишутся в файлы PROMETHEUS_MULTIPROC_DIR
+# и суммируются сервером метрик супервизора
+
+
+def prepare_multiproc_dir(path: str):
+    # Файлы прошлого запуска содержат значения уже несуществующих процессов
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def start_metrics_server(port: int):
+    from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+
+
+def main():
+    # Переменные окружения выставляются до импорта prometheus_client и
+    # наследуются воркерами uvicorn и процессами gRPC
+    prepare_multiproc_dir(settings.PROMETHEUS_MULTIPROC_DIR)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.PROMETHEUS_MULTIPROC_DIR
+    os.environ["APP_SUPERVISED"] = "true"
+    # При APP_WORKERS=1 uvicorn запускает приложение в этом же процессе
+    settings.APP_SUPERVISED = True
+
+    import uvicorn
+    from app.database import init_db
+    from app.grpc.grpc_server import serve as run_grpc_server
+    from app.logger import logger, start_log_server
+    from app.main import save_openapi_spec
+
+    # Воркеры и процессы gRPC пишут лог через супервизор
+    start_log_server()
+    init_db()
+    save_openapi_spec()
+    start_metrics_server(settings.METRICS_PORT)
+    logger.info(f"Сервер с метриками на порту {settings.METRICS_PORT} запущен")
+
+    grpc_process = None
+    if settings.GRPC_RUN_IN_APP:
+        grpc_process = multiprocessing.Process(target=run_grpc_server)
+        grpc_process.start()
+
+    logger.info(f"Запуск воркеров uvicorn: {settings.APP_WORKERS}")
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.APP_HOST,
+            port=settings.APP_PORT,
+            workers=settings.APP_WORKERS,
+        )
+    finally:
+        if grpc_process:
+            grpc_process.terminate()
+            grpc_process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+import psycopg
+
+from app.config import settings
+from app.operations import ALLOWED_CITIES, ALLOWED_PRODUCT_TYPES
+
+# Нагрузочный тест реального сценария работы ПВЗ против запущенного приложения:
+# каждый виртуальный пользователь в цикле создаёт ПВЗ, открывает приёмку,
+# добавляет товары, удаляет часть из них, закрывает приёмку и запрашивает
+# список ПВЗ. На выходе - JSON с RPS и p50/p95/p99 по каждому эндпоинту.
+#
+# Запуск (приложение на localhost:8080, БД из настроек DB_*):
+#   python -m benchmarks.load_test --concurrency 20 --duration 30
+#
+# Созданные ПВЗ удаляются из БД после замера, --keep-data оставляет их
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response = None
+            status = type(e).__name__
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][status] += 1
+        return response
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    # Метод ближайшего ранга
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    total = 0
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        total += len(values)
+        endpoints[name] = {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+            "statuses": dict(recorder.statuses[name]),
+        }
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+async def login(client, recorder: Recorder, role: str) -> dict | None:
+    # None - вход не удался, ошибка уже учтена в статусах POST /dummyLogin
+    response = await recorder.request(
+        client, "POST /dummyLogin", "POST", "/dummyLogin", json={"role": role}
+    )
+    if response is None or response.status_code != 200:
+        return None
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+async def workflow(client, recorder: Recorder, args, rnd, created: list):
+    moderator = await login(client, recorder, "moderator")
+    if moderator is None:
+        return
+    employee = await login(client, recorder, "employee")
+    if employee is None:
+        return
+
+    response = await recorder.request(
+        client,
+        "POST /pvz",
+        "POST",
+        "/pvz",
+        json={"city": rnd.choice(ALLOWED_CITIES)},
+        headers=moderator,
+    )
+    if response is None or response.status_code != 201:
+        return
+    pvz_id = response.json()["id"]
+    created.append(pvz_id)
+
+    await recorder.request(
+        client,
+        "POST /receptions",
+        "POST",
+        "/receptions",
+        json={"pvz_id": pvz_id},
+        headers=employee,
+    )
+
+    if args.batch:
+        await recorder.request(
+            client,
+            "POST /products/batch",
+            "POST",
+            "/products/batch",
+            json={
+                "pvz_id": pvz_id,
+                "items": [
+                    {"type": rnd.choice(ALLOWED_PRODUCT_TYPES)}
+                    for _ in range(args.products)
+                ],
+            },
+            headers=employee,
+        )
+    else:
+        for _ in range(args.products):
+            await recorder.request(
+                client,
+                "POST /products",
+                "POST",
+                "/products",
+                json={"pvz_id": pvz_id, "type": rnd.choice(ALLOWED_PRODUCT_TYPES)},
+                headers=employee,
+            )
+
+    for _ in range(args.deletes):
+        await recorder.request(
+            client,
+            "POST /pvz/{pvz_id}/delete_last_product",
+            "POST",
+            f"/pvz/{pvz_id}/delete_last_product",
+            headers=employee,
+        )
+
+    await recorder.request(
+        client,
+        "POST /pvz/{pvz_id}/close_last_reception",
+        "POST",
+        f"/pvz/{pvz_id}/close_last_reception",
+        headers=employee,
+    )
+
+    await recorder.request(
+        client,
+        "GET /pvz",
+        "GET",
+        "/pvz",
+        params={"page": 1, "limit": args.list_limit},
+        headers=moderator,
+    )
+
+
+async def virtual_user(user_id: int, client, recorder, args, deadline, created):
+    rnd = random.Random(args.seed + user_id)
+    iterations = 0
+    while time.perf_counter() < deadline and (
+        not args.iterations or iterations < args.iterations
+    ):
+        await workflow(client, recorder, args, rnd, created)
+        iterations += 1
+
+
+async def cleanup(pvz_ids: list):
+    conn = await psycopg.AsyncConnection.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        dbname=settings.DB_NAME,
+    )
+    async with conn:
+        await conn.execute(
+            "DELETE FROM products WHERE reception_id IN "
+            "(SELECT id FROM receptions WHERE pvz_id = ANY(%s::uuid[]))",
+            (pvz_ids,),
+        )
+        await conn.execute(
+            "DELETE FROM receptions WHERE pvz_id = ANY(%s::uuid[])", (pvz_ids,)
+        )
+        await conn.execute("DELETE FROM pvz WHERE id = ANY(%s::uuid[])", (pvz_ids,))
+        await conn.commit()
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def main(args):
+    recorder = Recorder()
+    created = []
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        try:
+            await asyncio.gather(
+                *(
+                    virtual_user(i, client, recorder, args, deadline, created)
+                    for i in range(args.concurrency)
+                )
+            )
+        finally:
+            elapsed = time.perf_counter() - start
+            if created and not args.keep_data:
+                await cleanup(created)
+
+    results = summarize(recorder, elapsed)
+    results["workflows"] = len(created)
+    results["revision"] = git_revision()
+    results["params"] = vars(args)
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест сценария приёмки товаров в ПВЗ"
+    )
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument(
+        "--concurrency", type=int, default=10, help="Виртуальных пользователей"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Длительность замера, секунд"
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=0,
+        help="Сценариев на пользователя, 0 - пока не истечёт duration",
+    )
+    parser.add_argument("--products", type=int, default=20, help="Товаров в приёмке")
+    parser.add_argument(
+        "--deletes", type=int, default=2, help="Удалений последнего товара"
+    )
+    parser.add_argument(
+        "--batch", action="store_true", help="Добавлять товары через /products/batch"
+    )
+    parser.add_argument("--list-limit", type=int, default=10, help="limit для GET /pvz")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Сохранить JSON с результатами в файл")
+    parser.add_argument(
+        "--keep-data", action="store_true", help="Не удалять созданные ПВЗ"
+    )
+    asyncio.run(main(parser.parse_args()))
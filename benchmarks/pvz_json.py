@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+import psycopg
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.database import get_pvz_json_async, get_pvz_list_async
+from app.schemas import PVZNested
+
+# Сравнение CPU приложения на один ответ GET /pvz для двух путей:
+# - обычный: словари в Python + валидация и сериализация через List[PVZNested],
+#   как это делает FastAPI для response_model;
+# - быстрый: JSON собирается в PostgreSQL (fast_json / PVZ_LIST_SQL_JSON).
+#
+# Запуск против локальной БД из настроек DB_*:
+#   python -m benchmarks.pvz_json --seed --iterations 200
+
+CITIES = ["Москва", "Санкт-Петербург", "Казань"]
+PRODUCT_TYPES = ["электроника", "одежда", "обувь"]
+
+pvz_list_adapter = TypeAdapter(List[PVZNested])
+
+
+async def seed(conn, pvz_count: int, receptions: int, products: int) -> list:
+    # Данные помечаются будущей датой регистрации, чтобы оказаться первой страницей
+    rnd = random.Random(42)
+    base = datetime(2100, 1, 1)
+    pvz_ids = []
+    cur = conn.cursor()
+    for i in range(pvz_count):
+        pvz_id = uuid.uuid4()
+        pvz_ids.append(pvz_id)
+        await cur.execute(
+            "INSERT INTO pvz (id, registration_date, city) VALUES (%s, %s, %s)",
+            (pvz_id, base + timedelta(minutes=i), rnd.choice(CITIES)),
+        )
+        for j in range(receptions):
+            reception_id = uuid.uuid4()
+            reception_date = base + timedelta(days=j, minutes=i)
+            await cur.execute(
+                "INSERT INTO receptions (id, date_time, pvz_id, status, last_seq) "
+                "VALUES (%s, %s, %s, 'close', %s)",
+                (reception_id, reception_date, pvz_id, products),
+            )
+            await cur.executemany(
+                "INSERT INTO products (id, date_time, type, reception_id, seq) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [
+                    (
+                        uuid.uuid4(),
+                        reception_date + timedelta(seconds=k, microseconds=k),
+                        rnd.choice(PRODUCT_TYPES),
+                        reception_id,
+                        k + 1,
+                    )
+                    for k in range(products)
+                ],
+            )
+    await conn.commit()
+    return pvz_ids
+
+
+async def cleanup(conn, pvz_ids: list):
+    await conn.rollback()
+    await conn.execute(
+        "DELETE FROM products WHERE reception_id IN "
+        "(SELECT id FROM receptions WHERE pvz_id = ANY(%s))",
+        (pvz_ids,),
+    )
+    await conn.execute("DELETE FROM receptions WHERE pvz_id = ANY(%s)", (pvz_ids,))
+    await conn.execute("DELETE FROM pvz WHERE id = ANY(%s)", (pvz_ids,))
+    await conn.commit()
+
+
+async def measure(conn, iterations: int, limit: int) -> dict:
+    async def python_path():
+        items = await get_pvz_list_async(conn, limit=limit)
+        return pvz_list_adapter.dump_json(pvz_list_adapter.validate_python(items))
+
+    async def sql_path():
+        items_json, _ = await get_pvz_json_async(conn, limit=limit)
+        # Как build_pvz_list_body в app/main.py
+        return orjson.dumps(orjson.loads(items_json))
+
+    results = {}
+    for name, path in (("python", python_path), ("sql_json", sql_path)):
+        await path()  # прогрев
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for _ in range(iterations):
+            body = await path()
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        await conn.rollback()
+        results[name] = {
+            "cpu_ms_per_response": round(cpu / iterations * 1000, 3),
+            "wall_ms_per_response": round(wall / iterations * 1000, 3),
+            "response_bytes": len(body),
+        }
+
+    python_cpu = results["python"]["cpu_ms_per_response"]
+    sql_cpu = results["sql_json"]["cpu_ms_per_response"]
+    results["cpu_saved_ms_per_response"] = round(python_cpu - sql_cpu, 3)
+    results["cpu_saved_percent"] = (
+        round((python_cpu - sql_cpu) / python_cpu * 100, 1) if python_cpu else 0.0
+    )
+    return results
+
+
+async def main(args):
+    conn = await psycopg.AsyncConnection.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        dbname=settings.DB_NAME,
+    )
+    pvz_ids = []
+    try:
+        if args.seed:
+            pvz_ids = await seed(conn, args.limit, args.receptions, args.products)
+        results = await measure(conn, args.iterations, args.limit)
+        results["params"] = vars(args)
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    finally:
+        if pvz_ids:
+            await cleanup(conn, pvz_ids)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="CPU на ответ GET /pvz: сборка JSON в Python и в PostgreSQL"
+    )
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=30, help="ПВЗ на странице")
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="Создать временные данные (limit ПВЗ) и удалить их после замера",
+    )
+    parser.add_argument("--receptions", type=int, default=3, help="Приёмок на ПВЗ")
+    parser.add_argument("--products", type=int, default=50, help="Товаров в приёмке")
+    asyncio.run(main(parser.parse_args()))
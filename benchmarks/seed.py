@@ -0,0 +1,238 @@
+import argparse
+import multiprocessing
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import psycopg
+
+from app.config import settings
+from app.operations import ALLOWED_CITIES, ALLOWED_PRODUCT_TYPES
+
+# Генератор синтетических данных для pvz/receptions/products через COPY.
+# Данные полностью определяются --seed: у каждого ПВЗ и каждой приёмки свой
+# генератор случайных чисел, поэтому таблицы заполняются по очереди
+# (pvz, затем receptions, затем products) без хранения всех строк в памяти.
+# Товары загружаются в --jobs процессов, каждый со своими ПВЗ и соединением.
+#
+# Схема должна быть создана миграциями. Запуск против БД из настроек DB_*:
+#   python -m benchmarks.seed --pvz-per-city 1000 --receptions 20 --products 170
+# (3 города x 1000 ПВЗ x 20 приёмок x ~170 товаров - около 10 млн товаров)
+
+COPY_CHUNK_ROWS = 10000
+
+
+def make_uuid(rnd: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rnd.getrandbits(128), version=4)
+
+
+def format_time(value: datetime) -> str:
+    return value.isoformat(sep=" ")
+
+
+class PVZPlan:
+    # ПВЗ и его приёмки без товаров: (id, date_time, status, число товаров)
+    def __init__(self, args, index: int, city: str):
+        rnd = random.Random(f"{args.seed}:pvz:{index}")
+        span = (args.end_date - args.start_date).total_seconds()
+        self.id = make_uuid(rnd)
+        self.city = city
+        self.registration_date = args.start_date + timedelta(
+            seconds=rnd.uniform(0, span)
+        )
+
+        # Приёмки идут друг за другом с экспоненциальными интервалами, в
+        # рабочее время ПВЗ. Последняя с вероятностью active_share не закрыта
+        self.receptions = []
+        moment = self.registration_date
+        for number in range(args.receptions):
+            moment += timedelta(hours=rnd.expovariate(1 / args.reception_hours))
+            opened = moment.replace(hour=rnd.randint(8, 21))
+            moment = opened if opened >= moment else opened + timedelta(days=1)
+            count = max(
+                0,
+                round(args.products * rnd.uniform(1 - args.jitter, 1 + args.jitter)),
+            )
+            last = number == args.receptions - 1
+            status = (
+                "in_progress" if last and rnd.random() < args.active_share else "close"
+            )
+            self.receptions.append((make_uuid(rnd), moment, status, count))
+
+
+def iter_plans(args, job: int = 0, jobs: int = 1):
+    index = 0
+    for city in ALLOWED_CITIES:
+        for _ in range(args.pvz_per_city):
+            if index % jobs == job:
+                yield PVZPlan(args, index, city)
+            index += 1
+
+
+def iter_product_lines(args, reception_id: uuid.UUID, start: datetime, count: int):
+    # Товары приёмки сканируются с интервалом в несколько секунд
+    rnd = random.Random(f"{args.seed}:reception:{reception_id}")
+    moment = start
+    for seq in range(1, count + 1):
+        moment += timedelta(seconds=rnd.uniform(2, 60))
+        yield (
+            f"{make_uuid(rnd)}\t{format_time(moment)}\t"
+            f"{rnd.choice(ALLOWED_PRODUCT_TYPES)}\t{reception_id}\t{seq}\n"
+        )
+
+
+def copy_lines(conn, statement: str, lines) -> int:
+    # Текстовый COPY, строки отправляются пачками
+    rows = 0
+    with conn.cursor() as cur:
+        with cur.copy(statement) as copy:
+            chunk = []
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) >= COPY_CHUNK_ROWS:
+                    copy.write("".join(chunk))
+                    rows += len(chunk)
+                    chunk = []
+            if chunk:
+                copy.write("".join(chunk))
+                rows += len(chunk)
+    conn.commit()
+    return rows
+
+
+def pvz_lines(args):
+    for plan in iter_plans(args):
+        yield f"{plan.id}\t{format_time(plan.registration_date)}\t{plan.city}\n"
+
+
+def reception_lines(args):
+    for plan in iter_plans(args):
+        for reception_id, moment, status, count in plan.receptions:
+            yield f"{reception_id}\t{format_time(moment)}\t{plan.id}\t{status}\t{count}\n"
+
+
+def product_lines(args, job: int, jobs: int):
+    for plan in iter_plans(args, job, jobs):
+        for reception_id, moment, _, count in plan.receptions:
+            yield from iter_product_lines(args, reception_id, moment, count)
+
+
+def connect():
+    return psycopg.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        dbname=settings.DB_NAME,
+    )
+
+
+def copy_products(args, job: int) -> int:
+    with connect() as conn:
+        if args.skip_fk_checks:
+            # Ссылки корректны по построению, триггеры FK отключаются на сессию
+            # (нужны права суперпользователя)
+            conn.execute("SET session_replication_role = replica")
+        return copy_lines(
+            conn,
+            "COPY products (id, date_time, type, reception_id, seq) FROM STDIN",
+            product_lines(args, job, args.jobs),
+        )
+
+
+def main(args):
+    conn = connect()
+    try:
+        if args.truncate:
+            conn.execute("TRUNCATE products, receptions, pvz")
+            conn.commit()
+
+        steps = [
+            (
+                "pvz",
+                "COPY pvz (id, registration_date, city) FROM STDIN",
+                pvz_lines,
+            ),
+            (
+                "receptions",
+                "COPY receptions (id, date_time, pvz_id, status, last_seq) FROM STDIN",
+                reception_lines,
+            ),
+        ]
+        total_start = time.perf_counter()
+        for table, statement, lines in steps:
+            start = time.perf_counter()
+            rows = copy_lines(conn, statement, lines(args))
+            elapsed = time.perf_counter() - start
+            print(f"{table}: {rows} строк за {elapsed:.1f} с")
+
+        # Приёмки уже закоммичены, так что процессы не ждут друг друга на FK
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.jobs) as pool:
+            rows = sum(
+                pool.starmap(copy_products, [(args, job) for job in range(args.jobs)])
+            )
+        elapsed = time.perf_counter() - start
+        print(f"products: {rows} строк за {elapsed:.1f} с")
+
+        conn.autocommit = True
+        conn.execute("ANALYZE pvz, receptions, products")
+        print(f"Готово за {time.perf_counter() - total_start:.1f} с")
+    finally:
+        conn.close()
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Заполнить БД синтетическими ПВЗ, приёмками и товарами через COPY"
+    )
+    parser.add_argument(
+        "--pvz-per-city", type=int, default=100, help="ПВЗ в каждом городе"
+    )
+    parser.add_argument("--receptions", type=int, default=10, help="Приёмок на ПВЗ")
+    parser.add_argument(
+        "--products", type=int, default=50, help="Товаров в приёмке в среднем"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.5,
+        help="Разброс числа товаров: от products*(1-jitter) до products*(1+jitter)",
+    )
+    parser.add_argument(
+        "--reception-hours",
+        type=float,
+        default=48,
+        help="Средний интервал между приёмками ПВЗ, часов",
+    )
+    parser.add_argument(
+        "--active-share",
+        type=float,
+        default=0.3,
+        help="Доля ПВЗ с незакрытой последней приёмкой",
+    )
+    parser.add_argument("--start-date", type=parse_date, default="2023-01-01")
+    parser.add_argument("--end-date", type=parse_date, default="2025-01-01")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Процессов для загрузки товаров",
+    )
+    parser.add_argument(
+        "--skip-fk-checks",
+        action="store_true",
+        help="Не проверять внешние ключи товаров при загрузке (суперпользователь)",
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Очистить pvz, receptions и products перед загрузкой",
+    )
+    main(parser.parse_args())
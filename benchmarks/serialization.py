@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.database import assemble_pvz_list
+from app.schemas import PVZNested, Product
+
+# CPU на сериализацию одного ответа POST /products и GET /pvz без БД и сети:
+# - fastapi: валидация словаря по response_model, jsonable_encoder и
+#   JSONResponse (json.dumps), как было до перехода на orjson;
+# - orjson: ORJSONResponse из готового словаря (model_response в app/main.py
+#   и build_pvz_list_body).
+#
+#   python -m benchmarks.serialization --iterations 2000 --pvz 10 --receptions 5 --products 20
+
+PRODUCT_FIELD = create_model_field("Response", Product, mode="serialization")
+PVZ_LIST_FIELD = create_model_field("Response", List[PVZNested], mode="serialization")
+
+
+def product_row(reception_id, moment: datetime) -> tuple:
+    return (uuid.uuid4(), moment, "электроника", reception_id)
+
+
+def build_product() -> dict:
+    product_id, date_time, product_type, reception_id = product_row(
+        uuid.uuid4(), datetime.now()
+    )
+    # Так возвращает товар app/operations.py
+    return {
+        "id": product_id,
+        "date_time": date_time,
+        "type": product_type,
+        "reception_id": reception_id,
+    }
+
+
+def build_pvz_page(pvz_count: int, receptions: int, products: int) -> list:
+    # Страница GET /pvz в том виде, в каком её собирает app/database.py
+    base = datetime(2024, 1, 1)
+    pvz_rows, reception_rows, product_rows = [], [], []
+    for i in range(pvz_count):
+        pvz_id = uuid.uuid4()
+        pvz_rows.append((pvz_id, base + timedelta(minutes=i), "Москва"))
+        for j in range(receptions):
+            reception_id = uuid.uuid4()
+            moment = base + timedelta(days=j, minutes=i)
+            reception_rows.append((reception_id, moment, pvz_id, "close"))
+            for k in range(products):
+                product_rows.append(
+                    product_row(reception_id, moment + timedelta(seconds=k))
+                )
+    return assemble_pvz_list(pvz_rows, reception_rows, product_rows)
+
+
+async def render_fastapi(field, content) -> bytes:
+    data = await serialize_response(field=field, response_content=content)
+    return JSONResponse(data).body
+
+
+async def render_orjson(field, content) -> bytes:
+    return ORJSONResponse(content).body
+
+
+async def measure(render, field, content, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        await render(field, content)
+    return (time.process_time() - start) / iterations
+
+
+async def main(args):
+    cases = {
+        "POST /products": (PRODUCT_FIELD, build_product()),
+        "GET /pvz": (
+            PVZ_LIST_FIELD,
+            build_pvz_page(args.pvz, args.receptions, args.products),
+        ),
+    }
+    results = {}
+    for name, (field, content) in cases.items():
+        # Оба пути должны давать один и тот же JSON
+        assert json.loads(await render_fastapi(field, content)) == json.loads(
+            await render_orjson(field, content)
+        )
+        fastapi_cpu = await measure(render_fastapi, field, content, args.iterations)
+        orjson_cpu = await measure(render_orjson, field, content, args.iterations)
+        results[name] = {
+            "bytes": len(await render_orjson(field, content)),
+            "fastapi_us": round(fastapi_cpu * 1e6, 1),
+            "orjson_us": round(orjson_cpu * 1e6, 1),
+            "speedup": round(fastapi_cpu / orjson_cpu, 1),
+        }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="CPU на сериализацию ответа: FastAPI response_model против orjson"
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--pvz", type=int, default=10, help="ПВЗ на странице")
+    parser.add_argument("--receptions", type=int, default=5, help="Приёмок на ПВЗ")
+    parser.add_argument("--products", type=int, default=20, help="Товаров в приёмке")
+    asyncio.run(main(parser.parse_args()))
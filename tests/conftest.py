@@ -1,9 +1,28 @@
 import pytest
+from contextlib import asynccontextmanager
+import psycopg
 import psycopg2
 from app.logger import logger
+from app.migrate import run_migrations
+from app.response_cache import invalidate_pvz_list
 from app.security import create_access_token, settings
 
 
+@pytest.fixture(scope="session", autouse=True)
+def migrate_test_db():
+    conn = psycopg2.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    try:
+        run_migrations(conn)
+    finally:
+        conn.close()
+
+
 @pytest.fixture(autouse=True)
 def disable_app_logger():
     logger.disabled = True
@@ -11,6 +30,13 @@ def disable_app_logger():
     logger.disabled = False
 
 
+@pytest.fixture(autouse=True)
+def empty_pvz_list_cache():
+    # Тесты меняют данные в обход эндпоинтов записи
+    invalidate_pvz_list()
+    yield
+
+
 @pytest.fixture
 def moderator_token():
     return create_access_token(role="moderator")
@@ -21,8 +47,8 @@ def employee_token():
     return create_access_token(role="employee")
 
 
-def override_get_db():
-    conn = psycopg2.connect(
+async def override_get_async_db():
+    conn = await psycopg.AsyncConnection.connect(
         host=settings.TEST_DB_HOST,
         port=settings.TEST_DB_PORT,
         user=settings.TEST_DB_USER,
@@ -32,4 +58,23 @@ def override_get_db():
     try:
         yield conn
     finally:
-        conn.close()
+        await conn.close()
+
+
+@asynccontextmanager
+async def async_test_db_session():
+    conn = await psycopg.AsyncConnection.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+def override_get_async_db_factory():
+    return async_test_db_session
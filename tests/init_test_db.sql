@@ -18,6 +18,7 @@ CREATE TABLE IF NOT EXISTS receptions (
     date_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     pvz_id UUID NOT NULL REFERENCES pvz(id),
     status VARCHAR(50) NOT NULL CHECK (status IN ('in_progress', 'close')),
+    last_seq INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (pvz_id) REFERENCES pvz(id) ON DELETE CASCADE
 );
 
@@ -27,6 +28,7 @@ CREATE TABLE IF NOT EXISTS products (
     date_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     type VARCHAR(50) NOT NULL CHECK (type IN ('', '', '')),
     reception_id UUID NOT NULL REFERENCES receptions(id),
+    seq INTEGER NOT NULL,
     FOREIGN KEY (reception_id) REFERENCES receptions(id) ON DELETE CASCADE
 );
 
@@ -44,12 +46,12 @@ INSERT INTO pvz (id, registration_date, city) VALUES
     ('55555555-5555-5555-5555-555555555555', '2023-02-02 10:00:00', '-'),
     ('66666666-6666-6666-6666-666666666666', '2023-02-03 11:00:00', '');
 
-INSERT INTO receptions (id, date_time, pvz_id, status) VALUES
-    ('77777777-7777-7777-7777-777777777777', '2023-03-01 13:00:00', '44444444-4444-4444-4444-444444444444', 'close'),
-    ('88888888-8888-8888-8888-888888888888', '2023-03-02 14:00:00', '55555555-5555-5555-5555-555555555555', 'in_progress'),
-    ('99999999-9999-9999-9999-999999999999', '2023-03-03 15:00:00', '66666666-6666-6666-6666-666666666666', 'in_progress');
+INSERT INTO receptions (id, date_time, pvz_id, status, last_seq) VALUES
+    ('77777777-7777-7777-7777-777777777777', '2023-03-01 13:00:00', '44444444-4444-4444-4444-444444444444', 'close', 2),
+    ('88888888-8888-8888-8888-888888888888', '2023-03-02 14:00:00', '55555555-5555-5555-5555-555555555555', 'in_progress', 1),
+    ('99999999-9999-9999-9999-999999999999', '2023-03-03 15:00:00', '66666666-6666-6666-6666-666666666666', 'in_progress', 0);
 
-INSERT INTO products (id, date_time, type, reception_id) VALUES
-    ('aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa', '2023-03-01 13:30:00', '', '77777777-7777-7777-7777-777777777777'),
-    ('bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb', '2023-03-01 13:35:00', '', '77777777-7777-7777-7777-777777777777'),
-    ('cccccccc-cccc-cccc-cccc-cccccccccccc', '2023-03-02 14:05:00', '', '88888888-8888-8888-8888-888888888888');
+INSERT INTO products (id, date_time, type, reception_id, seq) VALUES
+    ('aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa', '2023-03-01 13:30:00', '', '77777777-7777-7777-7777-777777777777', 1),
+    ('bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb', '2023-03-01 13:35:00', '', '77777777-7777-7777-7777-777777777777', 2),
+    ('cccccccc-cccc-cccc-cccc-cccccccccccc', '2023-03-02 14:05:00', '', '88888888-8888-8888-8888-888888888888', 1);
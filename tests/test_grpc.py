@@ -1,20 +1,35 @@
+import asyncio
+import threading
 import grpc
 import pytest
 import psycopg2
-from concurrent import futures
 from app.grpc.pvz_v1 import pvz_pb2, pvz_pb2_grpc
-from app.grpc.grpc_server import PVZService
-from app.security import settings
+from app.grpc.grpc_server import create_server
+from app.database import close_async_pool
+from app.security import settings, create_access_token
 
 
 @pytest.fixture(scope="module")
 def grpc_server():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    pvz_pb2_grpc.add_PVZServiceServicer_to_server(PVZService(), server)
-    server.add_insecure_port("[::]:3001")
-    server.start()
+    # Асинхронный сервер работает в отдельном потоке со своим event loop
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def run(coro):
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def start():
+        server = create_server(port=3001)
+        await server.start()
+        return server
+
+    server = run(start())
     yield server
-    server.stop(grace=None)
+    run(server.stop(grace=None))
+    run(close_async_pool())
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
 
 
 @pytest.fixture(scope="module")
@@ -35,17 +50,31 @@ def setup_test_data():
     )
     cur = conn.cursor()
 
-    pvz = ("11111111-1111-1111-1111-111111111111", "2023-01-01 10:00:00", "Москва")
+    pvzs = [
+        ("11111111-1111-1111-1111-111111111111", "2023-01-01 10:00:00", "Москва"),
+        ("22222222-2222-2222-2222-222222222222", "2023-01-02 10:00:00", "Казань"),
+        ("33333333-3333-3333-3333-333333333333", "2023-01-03 10:00:00", "Москва"),
+    ]
 
-    cur.execute(
-        "INSERT INTO pvz (id, registration_date, city) VALUES (%s, %s, %s)", pvz
-    )
+    for pvz in pvzs:
+        cur.execute(
+            "INSERT INTO pvz (id, registration_date, city) VALUES (%s, %s, %s)", pvz
+        )
 
     conn.commit()
-    yield
+    yield [pvz[0] for pvz in pvzs]
+    ids = [pvz[0] for pvz in pvzs]
     cur.execute(
-        "DELETE FROM pvz WHERE id = %s AND registration_date = %s AND city = %s", pvz
+        "DELETE FROM products WHERE reception_id IN "
+        "(SELECT id FROM receptions WHERE pvz_id::text = ANY(%s))",
+        (ids,),
     )
+    cur.execute("DELETE FROM receptions WHERE pvz_id::text = ANY(%s)", (ids,))
+    for pvz in pvzs:
+        cur.execute(
+            "DELETE FROM pvz WHERE id = %s AND registration_date = %s AND city = %s",
+            pvz,
+        )
     conn.commit()
     conn.close()
 
@@ -56,5 +85,132 @@ def test_get_pvz_list(grpc_channel, setup_test_data):
     response = stub.GetPVZList(pvz_pb2.GetPVZListRequest())
 
     assert response is not None
-    assert response.pvzs[-1].id == "11111111-1111-1111-1111-111111111111"
-    assert response.pvzs[-1].city == "Москва"
+    pvzs = {pvz.id: pvz for pvz in response.pvzs}
+    assert pvzs["11111111-1111-1111-1111-111111111111"].city == "Москва"
+    # Каталог упорядочен от старых ПВЗ к новым
+    ids = [pvz.id for pvz in response.pvzs]
+    assert [i for i in ids if i in setup_test_data] == setup_test_data
+
+
+def test_get_pvz_list_pagination(grpc_channel, setup_test_data):
+    # Обход каталога по страницам из одного ПВЗ без пропусков и повторов
+    stub = pvz_pb2_grpc.PVZServiceStub(grpc_channel)
+
+    ids = []
+    page_token = ""
+    while True:
+        response = stub.GetPVZList(
+            pvz_pb2.GetPVZListRequest(page_size=1, page_token=page_token)
+        )
+        assert len(response.pvzs) <= 1
+        ids.extend(pvz.id for pvz in response.pvzs)
+        page_token = response.next_page_token
+        if not page_token:
+            break
+
+    assert len(ids) == len(set(ids))
+    assert [i for i in ids if i in setup_test_data] == setup_test_data
+
+
+def test_get_pvz_list_invalid_page_token(grpc_channel):
+    stub = pvz_pb2_grpc.PVZServiceStub(grpc_channel)
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.GetPVZList(pvz_pb2.GetPVZListRequest(page_token="broken"))
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_stream_pvz_list(grpc_channel, setup_test_data):
+    # Потоковая выгрузка каталога сообщениями по chunk_size ПВЗ
+    stub = pvz_pb2_grpc.PVZServiceStub(grpc_channel)
+
+    chunks = list(stub.StreamPVZList(pvz_pb2.StreamPVZListRequest(chunk_size=2)))
+
+    assert all(len(chunk.pvzs) <= 2 for chunk in chunks)
+    ids = [pvz.id for chunk in chunks for pvz in chunk.pvzs]
+    assert [i for i in ids if i in setup_test_data] == setup_test_data
+
+
+def auth(role: str = "employee"):
+    return [("authorization", f"Bearer {create_access_token(role)}")]
+
+
+def test_reception_flow(grpc_channel, setup_test_data):
+    # Приёмка через gRPC: создание, поток товаров, удаление последнего, закрытие
+    stub = pvz_pb2_grpc.PVZServiceStub(grpc_channel)
+    pvz_id = setup_test_data[0]
+
+    reception = stub.CreateReception(
+        pvz_pb2.CreateReceptionRequest(pvz_id=pvz_id), metadata=auth()
+    )
+    assert reception.pvz_id == pvz_id
+    assert reception.status == pvz_pb2.RECEPTION_STATUS_IN_PROGRESS
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.CreateReception(
+            pvz_pb2.CreateReceptionRequest(pvz_id=pvz_id), metadata=auth()
+        )
+    assert error.value.code() == grpc.StatusCode.FAILED_PRECONDITION
+
+    requests = [pvz_pb2.AddProductRequest(pvz_id=pvz_id, type="обувь")] + [
+        pvz_pb2.AddProductRequest(type="одежда") for _ in range(2)
+    ]
+    response = stub.AddProducts(iter(requests), metadata=auth())
+    assert response.count == 3
+    assert len(set(response.product_ids)) == 3
+
+    deleted = stub.DeleteLastProduct(
+        pvz_pb2.DeleteLastProductRequest(pvz_id=pvz_id), metadata=auth()
+    )
+    assert deleted.product_id == response.product_ids[-1]
+
+    closed = stub.CloseReception(
+        pvz_pb2.CloseReceptionRequest(pvz_id=pvz_id), metadata=auth()
+    )
+    assert closed.id == reception.id
+    assert closed.status == pvz_pb2.RECEPTION_STATUS_CLOSED
+
+
+def test_write_rpc_errors(grpc_channel, setup_test_data):
+    # Те же проверки, что и в REST: роль, тип товара, активная приёмка
+    stub = pvz_pb2_grpc.PVZServiceStub(grpc_channel)
+    pvz_id = setup_test_data[1]
+    request = pvz_pb2.CreateReceptionRequest(pvz_id=pvz_id)
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.CreateReception(request)
+    assert error.value.code() == grpc.StatusCode.PERMISSION_DENIED
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.CreateReception(request, metadata=auth("moderator"))
+    assert error.value.code() == grpc.StatusCode.PERMISSION_DENIED
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.CloseReception(
+            pvz_pb2.CloseReceptionRequest(pvz_id="broken"), metadata=auth()
+        )
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.CloseReception(
+            pvz_pb2.CloseReceptionRequest(
+                pvz_id="00000000-0000-0000-0000-000000000000"
+            ),
+            metadata=auth(),
+        )
+    assert error.value.code() == grpc.StatusCode.NOT_FOUND
+
+    with pytest.raises(grpc.RpcError) as error:
+        stub.AddProducts(
+            iter([pvz_pb2.AddProductRequest(pvz_id=pvz_id, type="обувь")]),
+            metadata=auth(),
+        )
+    assert error.value.code() == grpc.StatusCode.FAILED_PRECONDITION
+
+    stub.CreateReception(request, metadata=auth())
+    with pytest.raises(grpc.RpcError) as error:
+        stub.AddProducts(
+            iter([pvz_pb2.AddProductRequest(pvz_id=pvz_id, type="мебель")]),
+            metadata=auth(),
+        )
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
@@ -3,12 +3,19 @@ import psycopg2
 import datetime
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import get_db
+from app.database import (
+    get_async_db,
+    get_async_db_factory,
+    get_async_read_db_factory,
+)
 from app.config import settings
-from tests.conftest import moderator_token, employee_token, override_get_db
+from tests.conftest import moderator_token, employee_token, override_get_async_db
+from tests.conftest import override_get_async_db_factory
 
 
-app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_db_factory] = override_get_async_db_factory
+app.dependency_overrides[get_async_read_db_factory] = override_get_async_db_factory
 
 client = TestClient(app)
 
@@ -71,8 +78,10 @@ def test_full_reception_flow(moderator_token, employee_token):
         headers={"Authorization": f"Bearer {employee_token}"},
     )
     assert db_response.status_code == 200
+    assert len(db_response.json()) == 1
     assert db_response.json()[0]["receptions"][0]["reception"]["status"] == "close"
-    assert len(db_response.json()[0]["receptions"][0]["products"]) == 30
+    # Пагинация идёт по ПВЗ: все товары приёмки попадают на одну страницу
+    assert len(db_response.json()[0]["receptions"][0]["products"]) == 50
 
     url = f"/pvz?start_date={date}&page=2&limit=30"
     db_response = client.get(
@@ -80,5 +89,4 @@ def test_full_reception_flow(moderator_token, employee_token):
         headers={"Authorization": f"Bearer {employee_token}"},
     )
     assert db_response.status_code == 200
-    assert db_response.json()[0]["receptions"][0]["reception"]["status"] == "close"
-    assert len(db_response.json()[0]["receptions"][0]["products"]) == 20
+    assert db_response.json() == []
@@ -0,0 +1,96 @@
+import json
+import logging
+import logging.handlers
+import sys
+import time
+from fastapi.testclient import TestClient
+from app.logger import (
+    JsonFormatter,
+    LogQueueHandler,
+    RequestIdFilter,
+    SamplingFilter,
+    create_log_server,
+    request_id_var,
+)
+from app.main import app
+
+# /dummyLogin не обращается к БД, переопределения зависимостей не нужны
+client = TestClient(app)
+
+
+def make_record(level=logging.INFO, msg="сообщение", exc_info=None):
+    return logging.LogRecord("backend", level, __file__, 1, msg, None, exc_info)
+
+
+def test_sampling_keeps_warnings():
+    # Сэмплирование отбрасывает только info, предупреждения пишутся всегда
+    sampling = SamplingFilter(0)
+    assert not sampling.filter(make_record(logging.INFO))
+    assert sampling.filter(make_record(logging.WARNING))
+    assert SamplingFilter(1).filter(make_record(logging.INFO))
+
+
+def test_json_record_with_request_id_and_traceback():
+    # Запись из очереди в JSON: id запроса и трейсбек отдельными полями
+    token = request_id_var.set("req-1")
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = make_record(logging.ERROR, "ошибка", exc_info=sys.exc_info())
+    RequestIdFilter().filter(record)
+    request_id_var.reset(token)
+
+    prepared = LogQueueHandler(None).prepare(record)
+    data = json.loads(JsonFormatter().format(prepared))
+    assert data["request_id"] == "req-1"
+    assert data["message"] == "ошибка"
+    assert "ZeroDivisionError" in data["exc_info"]
+
+
+def test_request_id_header():
+    # X-Request-ID клиента возвращается в ответе, без него генерируется новый
+    response = client.post(
+        "/dummyLogin", json={"role": "employee"}, headers={"X-Request-ID": "abc-123"}
+    )
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+    response = client.post("/dummyLogin", json={"role": "employee"})
+    assert len(response.headers["X-Request-ID"]) == 32
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_log_server_receives_child_records(tmp_path):
+    # Запись дочернего процесса доходит до владельца файла лога через сокет
+    # вместе с id запроса и трейсбеком
+    capture = CaptureHandler()
+    path = str(tmp_path / "log.sock")
+    server = create_log_server(path, capture)
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            record = make_record(logging.ERROR, "из воркера", exc_info=sys.exc_info())
+        record.request_id = "req-2"
+        sender = logging.handlers.SocketHandler(path, None)
+        sender.handle(LogQueueHandler(None).prepare(record))
+        sender.close()
+
+        deadline = time.monotonic() + 2
+        while not capture.records and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    received = capture.records[0]
+    assert received.getMessage() == "из воркера"
+    assert received.request_id == "req-2"
+    assert "ZeroDivisionError" in received.exc_text
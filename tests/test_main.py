@@ -1,13 +1,27 @@
 from fastapi.testclient import TestClient
+from app import main
 from app.main import app
-from app.database import get_db
+from app.database import (
+    get_async_db,
+    get_async_db_factory,
+    get_async_read_db_factory,
+)
 from app.config import settings
+from app.password_hasher import password_hasher
+from app.schemas import Product, Reception, Token, User
+import csv
+import io
+import json
 import psycopg2
 import pytest
-from tests.conftest import moderator_token, employee_token, override_get_db
+from prometheus_client import REGISTRY
+from tests.conftest import moderator_token, employee_token, override_get_async_db
+from tests.conftest import override_get_async_db_factory
 
 
-app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_db_factory] = override_get_async_db_factory
+app.dependency_overrides[get_async_read_db_factory] = override_get_async_db_factory
 
 client = TestClient(app)
 
@@ -121,6 +135,39 @@ def test_add_product_success(employee_token):
     assert response.json()["type"] == "одежда"
 
 
+def test_write_responses_match_models(employee_token):
+    # Ответы, сериализованные orjson в обход response_model, совпадают
+    # с сериализацией моделей байт в байт
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    pvz_id = "55555555-5555-5555-5555-555555555555"
+    response = client.post(
+        "/products", json={"type": "одежда", "pvz_id": pvz_id}, headers=headers
+    )
+    product = Product.model_validate_json(response.content)
+    assert product.model_dump_json().encode() == response.content
+
+    response = client.post(f"/pvz/{pvz_id}/close_last_reception", headers=headers)
+    reception = Reception.model_validate_json(response.content)
+    assert reception.model_dump_json().encode() == response.content
+
+    response = client.post("/dummyLogin", json={"role": "employee"})
+    assert Token.model_validate_json(response.content).model_dump_json().encode() == (
+        response.content
+    )
+
+    credentials = {"email": "orjson@example.com", "password": "123456"}
+    response = client.post("/register", json=dict(credentials, role="employee"))
+    assert response.status_code == 201
+    user = User.model_validate_json(response.content)
+    assert user.model_dump_json().encode() == response.content
+
+    response = client.post("/login", json=credentials)
+    assert response.status_code == 200
+    assert Token.model_validate_json(response.content).model_dump_json().encode() == (
+        response.content
+    )
+
+
 def test_add_product_invalid_type(employee_token):
     # Попытка добавить товар с неправильной категорией
     pvz_id = "55555555-5555-5555-5555-555555555555"
@@ -154,6 +201,51 @@ def test_add_product_in_closed_reception(employee_token):
     assert response.status_code == 400
 
 
+def test_add_products_batch_success(employee_token):
+    # Пакетное добавление: товары в порядке запроса, последний удаляется первым
+    pvz_id = "55555555-5555-5555-5555-555555555555"
+    types = ["обувь", "одежда", "электроника"]
+    response = client.post(
+        "/products/batch",
+        json={"pvz_id": pvz_id, "items": [{"type": t} for t in types]},
+        headers={"Authorization": f"Bearer {employee_token}"},
+    )
+    assert response.status_code == 201
+    products = response.json()
+    assert [product["type"] for product in products] == types
+    assert len({product["reception_id"] for product in products}) == 1
+
+    response = client.post(
+        f"/pvz/{pvz_id}/delete_last_product",
+        headers={"Authorization": f"Bearer {employee_token}"},
+    )
+    assert products[-1]["id"] in response.text
+
+
+def test_add_products_batch_invalid(employee_token, moderator_token):
+    # Недопустимый тип, пустой список, нет активной приёмки, чужая роль
+    cases = [
+        ("55555555-5555-5555-5555-555555555555", ["обувь", "еда"], employee_token, 400),
+        ("55555555-5555-5555-5555-555555555555", [], employee_token, 400),
+        ("44444444-4444-4444-4444-444444444444", ["обувь"], employee_token, 400),
+        ("55555555-5555-5555-5555-555555555555", ["обувь"], moderator_token, 403),
+    ]
+    for pvz_id, types, token, status_code in cases:
+        response = client.post(
+            "/products/batch",
+            json={"pvz_id": pvz_id, "items": [{"type": t} for t in types]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == status_code
+
+    # Ни один товар из отклонённых пакетов не сохранён
+    response = client.post(
+        "/pvz/55555555-5555-5555-5555-555555555555/delete_last_product",
+        headers={"Authorization": f"Bearer {employee_token}"},
+    )
+    assert "cccccccc-cccc-cccc-cccc-cccccccccccc" in response.text
+
+
 def test_delete_last_product_success(employee_token):
     # Удаляем последний товар
     pvz_id = "55555555-5555-5555-5555-555555555555"
@@ -165,6 +257,45 @@ def test_delete_last_product_success(employee_token):
     assert "cccccccc-cccc-cccc-cccc-cccccccccccc" in response.text
 
 
+def test_delete_last_product_is_lifo(employee_token):
+    # Товары удаляются в обратном порядке добавления даже при одинаковом времени
+    pvz_id = "55555555-5555-5555-5555-555555555555"
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    added = client.post(
+        "/products/batch",
+        json={"pvz_id": pvz_id, "items": [{"type": "обувь"}] * 3},
+        headers=headers,
+    ).json()
+
+    conn = psycopg2.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE products SET date_time = '2023-03-02 14:05:00' WHERE reception_id = %s",
+        ("88888888-8888-8888-8888-888888888888",),
+    )
+    conn.commit()
+
+    deleted = []
+    for _ in range(4):
+        response = client.post(f"/pvz/{pvz_id}/delete_last_product", headers=headers)
+        deleted.append(response.json()["message"].split()[1])
+    expected = [product["id"] for product in reversed(added)]
+    assert deleted == expected + ["cccccccc-cccc-cccc-cccc-cccccccccccc"]
+
+    cur.execute(
+        "SELECT last_seq FROM receptions WHERE id = %s",
+        ("88888888-8888-8888-8888-888888888888",),
+    )
+    assert cur.fetchone()[0] == 0
+    conn.close()
+
+
 def test_delete_last_product_no_product_available(employee_token):
     # Попытка удалить последний товар из пустой приемки
     pvz_id = "66666666-6666-6666-6666-666666666666"
@@ -226,6 +357,21 @@ def test_close_last_reception_already_closed(employee_token):
     assert response.status_code == 400
 
 
+def test_write_endpoints_missing_pvz(employee_token):
+    # Несуществующий ПВЗ: для всех записывающих эндпоинтов по-прежнему 400
+    pvz_id = "00000000-0000-0000-0000-000000000000"
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    responses = [
+        client.post("/receptions", json={"pvz_id": pvz_id}, headers=headers),
+        client.post(
+            "/products", json={"type": "обувь", "pvz_id": pvz_id}, headers=headers
+        ),
+        client.post(f"/pvz/{pvz_id}/delete_last_product", headers=headers),
+        client.post(f"/pvz/{pvz_id}/close_last_reception", headers=headers),
+    ]
+    assert [response.status_code for response in responses] == [400] * 4
+
+
 def test_get_pvz_list_success(moderator_token):
     # Запрос списка пвз
     response = client.get(
@@ -235,12 +381,209 @@ def test_get_pvz_list_success(moderator_token):
     assert len(response.json()) == 3
 
 
+def test_get_pvz_list_paginates_by_pvz(employee_token):
+    # limit и page считаются в ПВЗ, а не в строках с товарами
+    response = client.get(
+        "/pvz?page=1&limit=2", headers={"Authorization": f"Bearer {employee_token}"}
+    )
+    assert response.status_code == 200
+    assert [item["pvz"]["city"] for item in response.json()] == [
+        "Казань",
+        "Санкт-Петербург",
+    ]
+
+    response = client.get(
+        "/pvz?page=2&limit=2", headers={"Authorization": f"Bearer {employee_token}"}
+    )
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["pvz"]["id"] == "44444444-4444-4444-4444-444444444444"
+    assert len(data[0]["receptions"][0]["products"]) == 2
+
+
+def test_get_pvz_list_date_filter(employee_token):
+    # Фильтр по дате оставляет только ПВЗ с приёмками в диапазоне
+    response = client.get(
+        "/pvz?start_date=2023-03-02T00:00:00&end_date=2023-03-02T23:59:59",
+        headers={"Authorization": f"Bearer {employee_token}"},
+    )
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["pvz"]["id"] == "55555555-5555-5555-5555-555555555555"
+    assert data[0]["receptions"][0]["products"][0]["type"] == "обувь"
+
+
+def test_get_pvz_list_cursor_walks_all_pages(employee_token):
+    # Обход всех ПВЗ курсором: без пропусков и повторов
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(
+            "/pvz",
+            params={"limit": 2, "cursor": cursor},
+            headers={"Authorization": f"Bearer {employee_token}"},
+        )
+        assert response.status_code == 200
+        seen.extend(item["pvz"]["id"] for item in response.json()["items"])
+        cursor = response.json()["next_cursor"]
+
+    assert seen == [
+        "66666666-6666-6666-6666-666666666666",
+        "55555555-5555-5555-5555-555555555555",
+        "44444444-4444-4444-4444-444444444444",
+    ]
+
+
+def test_get_pvz_list_invalid_cursor(employee_token, monkeypatch):
+    # Повреждённый курсор отклоняется до того, как берётся соединение с БД
+    def no_db():
+        raise AssertionError("соединение с БД не нужно")
+
+    monkeypatch.setitem(
+        app.dependency_overrides, get_async_read_db_factory, lambda: no_db
+    )
+    response = client.get(
+        "/pvz?cursor=not-a-cursor",
+        headers={"Authorization": f"Bearer {employee_token}"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Некорректный курсор"
+
+
+def test_get_pvz_list_build_error_is_500(employee_token, monkeypatch):
+    # ValueError при сборке ответа (например, от orjson) - не ошибка курсора
+    async def broken(*args):
+        raise ValueError("unexpected character")
+
+    monkeypatch.setattr(main, "get_pvz_json_async", broken)
+    response = client.get(
+        "/pvz?fast_json=true&cursor=",
+        headers={"Authorization": f"Bearer {employee_token}"},
+    )
+    assert response.status_code == 500
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "/pvz",
+        "/pvz?page=2&limit=1",
+        "/pvz?start_date=2023-03-02T00:00:00&end_date=2023-03-02T23:59:59",
+        "/pvz?cursor=&limit=2",
+    ],
+)
+def test_get_pvz_list_fast_json_matches_default(employee_token, query):
+    # JSON, собранный в БД, совпадает с ответом обычного пути байт в байт,
+    # в том числе для дат с микросекундами и нулями в конце дробной части
+    conn = psycopg2.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE pvz SET registration_date = registration_date + interval '0.1994 s' "
+        "WHERE city = 'Казань'"
+    )
+    cur.execute(
+        "UPDATE receptions SET date_time = date_time + interval '0.000001 s' "
+        "WHERE status = 'close'"
+    )
+    cur.execute(
+        "UPDATE products SET date_time = date_time + interval '0.12 s' "
+        "WHERE type = 'одежда'"
+    )
+    conn.commit()
+    conn.close()
+
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    separator = "&" if "?" in query else "?"
+    default = client.get(f"{query}{separator}fast_json=false", headers=headers)
+    fast = client.get(f"{query}{separator}fast_json=true", headers=headers)
+    assert fast.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.content == default.content
+    assert fast.headers["ETag"] == default.headers["ETag"]
+
+
+def test_export_ndjson_matches_pvz_list(employee_token):
+    # NDJSON выгрузка содержит те же ПВЗ, что и GET /pvz
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    response = client.get("/pvz/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == client.get("/pvz", headers=headers).json()
+
+
+def test_export_csv_with_city_filter(moderator_token):
+    # CSV выгрузка: заголовок и строки ПВЗ x приёмка x товар выбранного города
+    response = client.get(
+        "/pvz/export",
+        params={"format": "csv", "city": "Москва"},
+        headers={"Authorization": f"Bearer {moderator_token}"},
+    )
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "pvz_id"
+    assert len(rows) == 3
+    assert {row[6] for row in rows[1:]} == {
+        "aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa",
+        "bbbbbbbb-bbbb-bbbb-bbbb-bbbbbbbbbbbb",
+    }
+
+
+def test_export_invalid_format(moderator_token):
+    # Неизвестный формат выгрузки
+    response = client.get(
+        "/pvz/export?format=xml",
+        headers={"Authorization": f"Bearer {moderator_token}"},
+    )
+    assert response.status_code == 400
+
+
 def test_get_pvz_list_unauthorized():
     # Запрос списка пвз без авторизации
     response = client.get("/pvz")
     assert response.status_code == 403
 
 
+def test_get_pvz_list_not_modified(employee_token):
+    # Неизменившаяся страница по If-None-Match возвращается как 304 без тела
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    saved = REGISTRY.get_sample_value("pvz_list_cache_bytes_saved_total")
+    response = client.get("/pvz", headers=headers)
+    etag = response.headers["ETag"]
+
+    response = client.get("/pvz", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert REGISTRY.get_sample_value("pvz_list_cache_bytes_saved_total") > saved
+
+
+def test_get_pvz_list_cache_invalidated_by_write(employee_token):
+    # Запись через API сбрасывает кэш, и ETag страницы меняется
+    headers = {"Authorization": f"Bearer {employee_token}"}
+    hits = REGISTRY.get_sample_value("pvz_list_cache_hits_total")
+    first = client.get("/pvz", headers=headers)
+    assert client.get("/pvz", headers=headers).headers["ETag"] == first.headers["ETag"]
+    assert REGISTRY.get_sample_value("pvz_list_cache_hits_total") == hits + 1
+
+    response = client.post(
+        "/products",
+        json={"type": "обувь", "pvz_id": "55555555-5555-5555-5555-555555555555"},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    response = client.get(
+        "/pvz", headers={**headers, "If-None-Match": first.headers["ETag"]}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != first.headers["ETag"]
+
+
 def test_register_success():
     # Успешная регистрация
     response = client.post(
@@ -295,3 +638,27 @@ def test_login_invalid_email():
         "/login", json={"email": "employee3@example.com", "password": "123456"}
     )
     assert response.status_code == 401
+
+
+def test_login_hasher_busy(monkeypatch):
+    # При заполненной очереди bcrypt сразу 503 с Retry-After
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    response = client.post(
+        "/login", json={"email": "moderator@example.com", "password": "123456"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.BCRYPT_RETRY_AFTER_SECONDS)
+
+
+def test_http_metrics_per_handler_and_status():
+    # Латентность и размеры считаются отдельно по пути, методу и коду ответа
+    labels = {"handler": "/dummyLogin", "method": "POST", "status": "400"}
+    count = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+    client.post("/dummyLogin", json={"role": "admin"})
+
+    assert (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+        == (count or 0) + 1
+    )
+    assert REGISTRY.get_sample_value("http_request_size_bytes_count", labels) >= 1
+    assert REGISTRY.get_sample_value("http_response_size_bytes_count", labels) >= 1
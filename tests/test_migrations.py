@@ -0,0 +1,236 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+import pytest
+from app import database, migrate
+from app.config import settings
+from app.migrate import (
+    MigrationError,
+    load_migrations,
+    run_migrations,
+    split_batched_statements,
+    split_statements,
+)
+
+
+@pytest.fixture
+def connection():
+    conn = psycopg2.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    yield conn
+    conn.close()
+
+
+def test_migrations_are_numbered_uniquely():
+    # Миграции читаются по порядку номеров
+    versions = [version for version, _, _ in load_migrations()]
+    assert versions == sorted(versions)
+    assert versions[0] == 1
+
+
+def test_split_statements_skips_comments():
+    # Комментарии и пустые выражения отбрасываются
+    sql = "-- comment\nCREATE INDEX a ON t (x);\n\n-- other\nDROP INDEX b;\n"
+    assert split_statements(sql) == ["CREATE INDEX a ON t (x)", "DROP INDEX b"]
+
+
+def test_split_statements_marks_batches():
+    # Выражение с пометкой batch повторяется пачками, остальные - один раз
+    sql = "CREATE INDEX a ON t (x);\n-- migrate: batch\nUPDATE t SET x = 1;\n"
+    assert split_batched_statements(sql) == [
+        ("CREATE INDEX a ON t (x)", False),
+        ("UPDATE t SET x = 1", True),
+    ]
+
+
+def test_run_migrations_is_idempotent(connection):
+    # Повторный запуск не применяет уже применённые миграции
+    run_migrations(connection)
+    assert run_migrations(connection) == []
+
+    cur = connection.cursor()
+    cur.execute("SELECT max(version) FROM schema_migrations")
+    assert cur.fetchone()[0] == load_migrations()[-1][0]
+
+
+def test_hot_query_indexes_exist(connection):
+    # Индексы под горячие запросы созданы и валидны
+    run_migrations(connection)
+    cur = connection.cursor()
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indisvalid AND c.relname IN (
+            'receptions_pvz_id_in_progress_idx',
+            'products_reception_id_date_time_idx',
+            'pvz_registration_date_id_idx',
+            'products_reception_id_seq_idx'
+        )
+        """
+    )
+    assert len(cur.fetchall()) == 4
+
+
+def test_waiting_for_lock_does_not_block_concurrent_index(connection, monkeypatch):
+    # Пока один процесс строит индекс CONCURRENTLY под блокировкой миграций,
+    # второй ждёт её без открытого снапшота и не вызывает взаимную блокировку
+    monkeypatch.setattr(migrate, "MIGRATIONS_LOCK_POLL_SECONDS", 0.05)
+    connection.autocommit = True
+    cur = connection.cursor()
+    cur.execute("SET statement_timeout = '10s'")
+    cur.execute("CREATE TABLE IF NOT EXISTS migrate_lock_test (x INTEGER)")
+    cur.execute("SELECT pg_advisory_lock(%s)", (migrate.MIGRATIONS_LOCK_ID,))
+
+    waiter = psycopg2.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(run_migrations, waiter)
+        try:
+            time.sleep(0.2)
+            assert not future.done()
+            cur.execute(
+                "CREATE INDEX CONCURRENTLY migrate_lock_test_x_idx"
+                " ON migrate_lock_test (x)"
+            )
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (migrate.MIGRATIONS_LOCK_ID,))
+            cur.execute("DROP TABLE migrate_lock_test")
+        assert future.result(timeout=5) == []
+    waiter.close()
+
+
+def test_init_db_fails_on_migration_error(monkeypatch):
+    # Ошибка миграции прерывает запуск, а не только пишется в лог
+    def broken(connection):
+        raise MigrationError("Миграция 0002_hot_query_indexes не применена")
+
+    monkeypatch.setattr(database, "run_migrations", broken)
+    with pytest.raises(MigrationError):
+        database.init_db()
+
+
+def test_active_reception_index_closes_duplicates(connection):
+    # Миграция 0002 закрывает лишние незакрытые приёмки ПВЗ, оставляя самую
+    # новую, и после этого строит уникальный индекс
+    migrations = {version: sql for version, _, sql in load_migrations()}
+    connection.autocommit = True
+    cur = connection.cursor()
+    cur.execute("DROP SCHEMA IF EXISTS migrate_dedup_test CASCADE")
+    cur.execute("CREATE SCHEMA migrate_dedup_test")
+    try:
+        cur.execute("SET search_path TO migrate_dedup_test")
+        cur.execute(migrations[1])
+        cur.execute("INSERT INTO pvz (city) VALUES ('Казань') RETURNING id")
+        pvz_id = cur.fetchone()[0]
+        cur.execute(
+            """
+            INSERT INTO receptions (date_time, pvz_id, status)
+            VALUES (now() - interval '2 hours', %s, 'in_progress'),
+                   (now() - interval '1 hour', %s, 'in_progress'),
+                   (now(), %s, 'in_progress')
+            RETURNING id
+            """,
+            (pvz_id, pvz_id, pvz_id),
+        )
+        newest = cur.fetchall()[-1][0]
+
+        for statement in split_statements(migrations[2]):
+            cur.execute(statement)
+
+        cur.execute("SELECT id FROM receptions WHERE status = 'in_progress'")
+        assert cur.fetchall() == [(newest,)]
+        cur.execute(
+            """
+            SELECT i.indisunique AND i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'receptions_pvz_id_in_progress_idx'
+              AND c.relnamespace = 'migrate_dedup_test'::regnamespace
+            """
+        )
+        assert cur.fetchone() == (True,)
+    finally:
+        cur.execute("RESET search_path")
+        cur.execute("DROP SCHEMA migrate_dedup_test CASCADE")
+
+
+def test_product_seq_backfill_in_batches(connection, tmp_path):
+    # Миграция 0005 нумерует существующие товары пачками, продолжая last_seq,
+    # и включает проверку NOT NULL и уникальный индекс без долгих блокировок
+    for path in sorted(migrate.MIGRATIONS_DIR.glob("000[1-4]_*.sql")):
+        (tmp_path / path.name).write_bytes(path.read_bytes())
+    connection.autocommit = True
+    cur = connection.cursor()
+    cur.execute("DROP SCHEMA IF EXISTS migrate_seq_test CASCADE")
+    cur.execute("CREATE SCHEMA migrate_seq_test")
+    try:
+        cur.execute("SET search_path TO migrate_seq_test")
+        run_migrations(connection, tmp_path)
+        connection.autocommit = True
+        # 1500 приёмок - больше одной пачки, у товаров приёмки одинаковое время
+        cur.execute(
+            """
+            WITH new_pvz AS (
+                INSERT INTO pvz (city) VALUES ('Москва') RETURNING id
+            ), new_receptions AS (
+                INSERT INTO receptions (date_time, pvz_id, status)
+                SELECT now(), new_pvz.id, 'close'
+                FROM new_pvz, generate_series(1, 1500)
+                RETURNING id
+            )
+            INSERT INTO products (date_time, type, reception_id)
+            SELECT '2025-01-01', 'обувь', new_receptions.id
+            FROM new_receptions, generate_series(1, 3)
+            """
+        )
+
+        migration = migrate.MIGRATIONS_DIR / "0005_product_seq.sql"
+        (tmp_path / migration.name).write_bytes(migration.read_bytes())
+        assert run_migrations(connection, tmp_path) == [5]
+        connection.autocommit = True
+
+        cur.execute(
+            """
+            SELECT count(*)
+            FROM products p
+            JOIN receptions r ON r.id = p.reception_id
+            WHERE r.last_seq <> 3 OR p.seq <> (
+                SELECT count(*) FROM products o
+                WHERE o.reception_id = p.reception_id
+                  AND (o.date_time, o.id) <= (p.date_time, p.id)
+            )
+            """
+        )
+        assert cur.fetchone()[0] == 0
+        cur.execute(
+            "SELECT convalidated FROM pg_constraint"
+            " WHERE conname = 'products_seq_not_null'"
+            " AND connamespace = 'migrate_seq_test'::regnamespace"
+        )
+        assert cur.fetchone() == (True,)
+        cur.execute(
+            """
+            SELECT c.relname, i.indisunique AND i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relnamespace = 'migrate_seq_test'::regnamespace
+              AND c.relname LIKE 'products_reception_id_seq%'
+            """
+        )
+        assert cur.fetchall() == [("products_reception_id_seq_idx", True)]
+    finally:
+        connection.autocommit = True
+        cur.execute("RESET search_path")
+        cur.execute("DROP SCHEMA migrate_seq_test CASCADE")
@@ -0,0 +1,71 @@
+import asyncio
+import psycopg2
+import pytest
+from app import operations
+from app.config import settings
+from tests.conftest import async_test_db_session
+
+
+@pytest.fixture
+def test_data():
+    conn = psycopg2.connect(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+    )
+    with open("tests/init_test_db.sql", "r", encoding="CP1251") as f:
+        conn.cursor().execute(f.read())
+    conn.commit()
+    conn.close()
+
+
+def test_add_product_after_close_fails(test_data):
+    # После закрытия приёмки товар добавить нельзя
+    pvz_id = "55555555-5555-5555-5555-555555555555"
+
+    async def scenario():
+        async with async_test_db_session() as conn:
+            product = await operations.add_product(conn, "employee", pvz_id, "обувь")
+            await operations.close_last_reception(conn, "employee", pvz_id)
+            with pytest.raises(operations.FailedPrecondition):
+                await operations.add_product(conn, "employee", pvz_id, "обувь")
+            return product
+
+    product = asyncio.run(scenario())
+    assert str(product["reception_id"]) == "88888888-8888-8888-8888-888888888888"
+
+
+def test_delete_waits_for_concurrent_insert(test_data):
+    # Удаление, ждущее блокировку приёмки за вставкой, снимает вставленный товар
+    pvz_id = "66666666-6666-6666-6666-666666666666"
+
+    async def scenario():
+        async with async_test_db_session() as inserting, async_test_db_session() as deleting:
+            commit = inserting.commit
+            inserted = asyncio.Event()
+            release = asyncio.Event()
+
+            async def delayed_commit():
+                # Транзакция вставки держит строку приёмки до сигнала
+                inserted.set()
+                await release.wait()
+                await commit()
+
+            inserting.commit = delayed_commit
+            insert = asyncio.create_task(
+                operations.add_product(inserting, "employee", pvz_id, "обувь")
+            )
+            await inserted.wait()
+            delete = asyncio.create_task(
+                operations.delete_last_product(deleting, "employee", pvz_id)
+            )
+            await asyncio.sleep(0.2)
+            assert not delete.done()
+            release.set()
+            product = await insert
+            return product, await delete
+
+    product, deleted_id = asyncio.run(scenario())
+    assert deleted_id == product["id"]
@@ -0,0 +1,47 @@
+import asyncio
+import time
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from app.password_hasher import HasherBusy, PasswordHasher
+from app.security import verify_password
+
+
+def test_hasher_recovers_after_worker_dies():
+    # Аварийно завершившийся процесс bcrypt не ломает последующие запросы
+    hasher = PasswordHasher(workers=1, max_pending=4)
+
+    async def scenario():
+        await hasher.hash("123456")
+        executor = hasher._executor
+        for process in list(executor._processes.values()):
+            process.kill()
+            process.join()
+        time.sleep(0.2)
+        hashed = await hasher.hash("123456")
+        return executor, hashed
+
+    try:
+        broken, hashed = asyncio.run(scenario())
+        assert hasher._executor is not broken
+        assert verify_password("123456", hashed)
+    finally:
+        hasher.shutdown()
+
+
+def test_hasher_busy_when_pool_keeps_breaking(monkeypatch):
+    # Если и пересозданный пул сломан, запрос получает HasherBusy (503)
+    hasher = PasswordHasher(workers=1, max_pending=4)
+    executors = []
+
+    def broken_submit(self, fn, *args, **kwargs):
+        executors.append(self)
+        raise BrokenProcessPool("процесс завершился")
+
+    monkeypatch.setattr("concurrent.futures.ProcessPoolExecutor.submit", broken_submit)
+    try:
+        with pytest.raises(HasherBusy):
+            asyncio.run(hasher.hash("123456"))
+        assert len(executors) == 2 and executors[0] is not executors[1]
+        assert hasher.pending == 0
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,73 @@
+import asyncio
+from prometheus_client import REGISTRY
+from app.config import settings
+from app.metrics import DB_POOL_IN_USE
+from app.pool import async_connection, create_async_pool
+
+
+def make_async_pool(**kwargs):
+    params = dict(
+        min_size=1,
+        max_size=1,
+        timeout=1.0,
+        recycle_seconds=1800,
+        check_idle_seconds=0,
+        name="test_async",
+    )
+    params.update(kwargs)
+    return create_async_pool(
+        host=settings.TEST_DB_HOST,
+        port=settings.TEST_DB_PORT,
+        user=settings.TEST_DB_USER,
+        password=settings.TEST_DB_PASSWORD,
+        dbname=settings.TEST_DB_NAME,
+        **params,
+    )
+
+
+def test_async_pool_connection():
+    # Асинхронный пул: соединение выдаётся, транзакция откатывается при возврате
+    async def scenario():
+        pool = make_async_pool()
+        await pool.open()
+        async with async_connection(pool) as conn:
+            assert DB_POOL_IN_USE.labels(pool="test_async")._value.get() == 1
+            cur = conn.cursor()
+            await cur.execute("SELECT 1")
+            assert (await cur.fetchone())[0] == 1
+        assert DB_POOL_IN_USE.labels(pool="test_async")._value.get() == 0
+        async with async_connection(pool) as same_conn:
+            assert same_conn is conn
+            assert same_conn.info.transaction_status == 0
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_async_pool_wait_time_metric():
+    # Ожидание свободного соединения попадает в db_pool_wait_seconds
+    labels = {"pool": "test_async_wait"}
+
+    async def scenario():
+        pool = make_async_pool(name="test_async_wait", timeout=2.0)
+        await pool.open()
+        count = REGISTRY.get_sample_value("db_pool_wait_seconds_count", labels) or 0
+        waited = REGISTRY.get_sample_value("db_pool_wait_seconds_sum", labels) or 0
+
+        async def hold():
+            async with async_connection(pool):
+                await asyncio.sleep(0.2)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        async with async_connection(pool):
+            pass
+        await holder
+        await pool.close()
+        return count, waited
+
+    count, waited = asyncio.run(scenario())
+    assert REGISTRY.get_sample_value("db_pool_wait_seconds_count", labels) == count + 2
+    assert (
+        REGISTRY.get_sample_value("db_pool_wait_seconds_sum", labels) >= waited + 0.15
+    )
@@ -0,0 +1,47 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from prometheus_client import REGISTRY
+from app.config import settings
+from app.logger import logger
+from app.query_timing import execute, redact_params, timed_query
+from tests.conftest import async_test_db_session
+
+
+def test_redact_params_hides_values():
+    # В лог попадают только типы параметров, а не их значения
+    params = ("user@example.com", [uuid.uuid4(), uuid.uuid4()], datetime.now())
+    assert redact_params(params) == "(str, list[2], datetime)"
+    assert redact_params({"pvz_id": uuid.uuid4(), "count": 3}) == (
+        "{pvz_id: UUID, count: int}"
+    )
+    assert redact_params(None) == "-"
+
+
+def test_slow_query_logged_without_values(monkeypatch):
+    # Запрос дольше порога пишется в лог с именем и без значений параметров
+    messages = []
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_SECONDS", 0.001)
+    monkeypatch.setattr(logger, "warning", messages.append)
+    with timed_query("test_slow", ("secret@example.com",)):
+        time.sleep(0.002)
+    assert len(messages) == 1
+    assert "test_slow" in messages[0]
+    assert "(str)" in messages[0]
+    assert "secret@example.com" not in messages[0]
+
+
+def test_query_duration_histogram():
+    # Каждый запрос замеряется под своим именем
+    labels = {"query": "test_select"}
+    count = REGISTRY.get_sample_value("db_query_duration_seconds_count", labels) or 0
+
+    async def scenario():
+        async with async_test_db_session() as conn:
+            await execute(conn.cursor(), "test_select", "SELECT %s", (1,))
+
+    asyncio.run(scenario())
+    assert REGISTRY.get_sample_value("db_query_duration_seconds_count", labels) == (
+        count + 1
+    )
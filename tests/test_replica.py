@@ -0,0 +1,105 @@
+import asyncio
+from prometheus_client import REGISTRY
+from app import database
+from app.config import settings
+from app.database import async_read_session, close_async_pool, close_replica_pool
+
+# Реплику изображает тестовая БД: так соединения с ней легко отличить от
+# соединений с основной БД (DB_NAME)
+TEST_DB_DSN = (
+    f"host={settings.TEST_DB_HOST} port={settings.TEST_DB_PORT} "
+    f"user={settings.TEST_DB_USER} password={settings.TEST_DB_PASSWORD} "
+    f"dbname={settings.TEST_DB_NAME}"
+)
+
+
+def read_dbname() -> str:
+    async def scenario():
+        try:
+            async with async_read_session() as conn:
+                return conn.info.dbname
+        finally:
+            await close_replica_pool()
+            await close_async_pool()
+
+    return asyncio.run(scenario())
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_read_session_uses_replica(monkeypatch):
+    # Доступная реплика без отставания обслуживает чтение
+    monkeypatch.setattr(settings, "DB_REPLICA_DSN", TEST_DB_DSN)
+    before = sample("db_read_sessions_total", {"target": "replica"})
+
+    assert read_dbname() == settings.TEST_DB_NAME
+    assert sample("db_read_sessions_total", {"target": "replica"}) == before + 1
+
+
+def test_read_session_falls_back_when_replica_unavailable(monkeypatch):
+    # Недоступная реплика не ломает чтение: оно идёт в основную БД
+    monkeypatch.setattr(settings, "DB_REPLICA_DSN", "host=localhost port=1")
+    monkeypatch.setattr(settings, "DB_REPLICA_TIMEOUT", 0.2)
+    before = sample("db_replica_fallbacks_total", {"reason": "unavailable"})
+
+    assert read_dbname() == settings.DB_NAME
+    assert sample("db_replica_fallbacks_total", {"reason": "unavailable"}) == (
+        before + 1
+    )
+
+
+def test_read_session_falls_back_when_replica_lags(monkeypatch):
+    # Реплика, отстающая больше DB_REPLICA_MAX_LAG_SECONDS, не используется
+    monkeypatch.setattr(settings, "DB_REPLICA_DSN", TEST_DB_DSN)
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 5.0)
+    monkeypatch.setattr(database, "REPLICA_LAG_QUERY", "SELECT 30.0")
+    before = sample("db_replica_fallbacks_total", {"reason": "lag"})
+
+    assert read_dbname() == settings.DB_NAME
+    assert sample("db_replica_fallbacks_total", {"reason": "lag"}) == before + 1
+    assert REGISTRY.get_sample_value("db_replica_lag_seconds") == 30.0
+
+
+def test_read_session_without_replica():
+    # Без DB_REPLICA_DSN всё читается из основной БД
+    assert settings.DB_REPLICA_DSN == ""
+    assert read_dbname() == settings.DB_NAME
+
+
+def test_read_session_falls_back_when_wal_receiver_stopped(monkeypatch):
+    # Реплика без потока WAL "применила всё полученное", но может быть
+    # устаревшей: отставание оценивается по последней применённой транзакции
+    monkeypatch.setattr(settings, "DB_REPLICA_DSN", TEST_DB_DSN)
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 5.0)
+    monkeypatch.setattr(
+        database,
+        "REPLICA_LAG_QUERY",
+        database.replica_lag_query(
+            "SELECT true AS in_recovery, true AS replayed_all,"
+            " false AS streaming, 600.0 AS replay_age"
+        ),
+    )
+    before = sample("db_replica_fallbacks_total", {"reason": "lag"})
+
+    assert read_dbname() == settings.DB_NAME
+    assert sample("db_replica_fallbacks_total", {"reason": "lag"}) == before + 1
+    assert REGISTRY.get_sample_value("db_replica_lag_seconds") == 600.0
+
+
+def test_read_session_uses_streaming_replica_without_writes(monkeypatch):
+    # Реплика с потоком WAL, применившая всё полученное, не отстаёт, даже если
+    # в основную БД давно не писали
+    monkeypatch.setattr(settings, "DB_REPLICA_DSN", TEST_DB_DSN)
+    monkeypatch.setattr(
+        database,
+        "REPLICA_LAG_QUERY",
+        database.replica_lag_query(
+            "SELECT true AS in_recovery, true AS replayed_all,"
+            " true AS streaming, 600.0 AS replay_age"
+        ),
+    )
+
+    assert read_dbname() == settings.TEST_DB_NAME
+    assert REGISTRY.get_sample_value("db_replica_lag_seconds") == 0
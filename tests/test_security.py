@@ -0,0 +1,65 @@
+import time
+import pytest
+from jose import jwt
+from app.config import settings
+from app.metrics import JWT_CACHE_HITS, JWT_CACHE_MISSES
+from app.security import (
+    VerifiedTokenCache,
+    create_access_token,
+    decode_role,
+    verified_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    verified_tokens.clear()
+    yield
+    verified_tokens.clear()
+
+
+def test_decode_role_uses_cache():
+    # Повторный запрос с тем же токеном не проверяет подпись заново
+    token = create_access_token("employee")
+    hits, misses = JWT_CACHE_HITS._value.get(), JWT_CACHE_MISSES._value.get()
+
+    assert decode_role(token) == "employee"
+    assert decode_role(token) == "employee"
+    assert JWT_CACHE_MISSES._value.get() == misses + 1
+    assert JWT_CACHE_HITS._value.get() == hits + 1
+
+
+def test_invalid_token_is_not_cached():
+    # Токен с чужой подписью отклоняется и не попадает в кэш
+    token = jwt.encode(
+        {"role": "moderator", "exp": time.time() + 60}, "other-key", "HS256"
+    )
+    for _ in range(2):
+        with pytest.raises(Exception):
+            decode_role(token)
+    assert len(verified_tokens) == 0
+
+
+def test_cache_entry_expires_with_token():
+    # Запись живёт до exp токена, старые записи вытесняются по LRU
+    cache = VerifiedTokenCache(max_size=2)
+    cache.set(b"expired", "employee", time.time() - 1)
+    assert cache.get(b"expired") is None
+
+    cache.set(b"a", "employee", time.time() + 60)
+    cache.set(b"b", "moderator", time.time() + 60)
+    cache.get(b"a")
+    cache.set(b"c", "employee", time.time() + 60)
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == "employee"
+
+
+def test_login_token_is_cached():
+    # Токен /login (с sub пользователя) кэшируется так же, как dummyLogin
+    token = jwt.encode(
+        {"sub": "user-id", "role": "moderator", "exp": time.time() + 60},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+    assert decode_role(token) == "moderator"
+    assert len(verified_tokens) == 1
@@ -0,0 +1,12 @@
+from app.server import prepare_multiproc_dir
+
+
+def test_prepare_multiproc_dir_removes_stale_files(tmp_path):
+    # Файлы метрик прошлого запуска удаляются перед стартом воркеров
+    path = tmp_path / "metrics"
+    path.mkdir()
+    (path / "counter_123.db").write_bytes(b"stale")
+
+    prepare_multiproc_dir(str(path))
+    assert path.is_dir()
+    assert list(path.iterdir()) == []